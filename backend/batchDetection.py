@@ -0,0 +1,57 @@
+# batchDetection.py
+"""Image sources for POST /detect/batch: multipart uploads, zip and tar archives."""
+import os
+import tarfile
+import zipfile
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+ARCHIVE_TYPES = {
+    'application/zip': 'zip',
+    'application/x-zip-compressed': 'zip',
+    'application/x-tar': 'tar',
+    'application/gzip': 'tar',
+    'application/x-gtar': 'tar',
+    'application/x-gzip': 'tar',
+}
+
+
+def is_image_name(name):
+    base = os.path.basename(name)
+    return not base.startswith('.') and base.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_zip(fileobj):
+    """(name, bytes) for every image in a zip archive, in archive order"""
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and is_image_name(info.filename):
+                yield info.filename, archive.read(info)
+
+
+def iter_tar(fileobj):
+    """(name, bytes) for every image in a (possibly compressed) tar archive.
+
+    The archive is read front to back, so members are never loaded twice.
+    """
+    with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+        for member in archive:
+            if member.isfile() and is_image_name(member.name):
+                yield member.name, archive.extractfile(member).read()
+
+
+def iter_archive(fileobj, kind=None):
+    """Images of a zip or tar archive; kind is guessed from the content when not given"""
+    if kind is None:
+        kind = 'zip' if zipfile.is_zipfile(fileobj) else 'tar'
+        fileobj.seek(0)
+    if kind == 'zip':
+        return iter_zip(fileobj)
+    return iter_tar(fileobj)
+
+
+def iter_uploads(uploads):
+    """(name, bytes) for multipart UploadFiles, reading each one only when it's needed"""
+    for upload in uploads:
+        upload.file.seek(0)
+        yield upload.filename or 'image', upload.file.read()
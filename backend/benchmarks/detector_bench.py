@@ -0,0 +1,202 @@
+# benchmarks/detector_bench.py
+"""Replay frames through ObjectDetector.process_frame and report throughput and tail latency.
+
+Each frame goes through the whole per-frame path: decode, both models,
+post-processing and overlap removal. Frames come from a folder of images or
+are generated, and are JPEG-encoded at every requested resolution.
+
+Run from the backend directory:
+    python -m benchmarks.detector_bench --resolutions 640x480 1280x720 --concurrency 1 2
+    python -m benchmarks.detector_bench --frames ./frames --output bench.json
+"""
+import argparse
+import base64
+import json
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from detectionMetrics import REGISTRY
+from frameDecoder import decode_frame
+
+# Histograms in REGISTRY that ObjectDetector observes while processing frames
+_STAGE_METRICS = (
+    'mantra_detection_stage_duration_milliseconds',
+    'mantra_detection_model_duration_milliseconds',
+)
+
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def synthetic_frames(count, width=1280, height=720, seed=0):
+    """Noisy street-like scenes with a few solid shapes, so JPEGs have realistic sizes"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        frame = rng.integers(60, 200, size=(height, width, 3), dtype=np.uint8)
+        frame = cv2.GaussianBlur(frame, (0, 0), 3)
+        for _ in range(rng.integers(3, 8)):
+            x, y = rng.integers(0, width - 40), rng.integers(0, height - 40)
+            w, h = rng.integers(20, width // 3), rng.integers(20, height // 2)
+            color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+            cv2.rectangle(frame, (int(x), int(y)), (int(x + w), int(y + h)), color, -1)
+        frames.append(frame)
+    return frames
+
+
+def encode_frames(frames, resolution, quality=50, data_url=False):
+    """JPEG payloads at a resolution, as binary messages or base64 data URLs"""
+    payloads = []
+    for frame in frames:
+        resized = cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise RuntimeError('JPEG encoding failed')
+        data = jpeg.tobytes()
+        if data_url:
+            data = 'data:image/jpeg;base64,' + base64.b64encode(data).decode('ascii')
+        payloads.append(data)
+    return payloads
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stage_snapshot():
+    snapshot = {}
+    for name in _STAGE_METRICS:
+        for labels, histogram in REGISTRY.series(name):
+            data = histogram.snapshot()
+            snapshot[next(iter(labels.values()))] = (data['sum'], data['count'])
+    return snapshot
+
+
+def _stage_means(before, after):
+    means = {}
+    for stage, (total, count) in after.items():
+        prev_total, prev_count = before.get(stage, (0.0, 0))
+        if count > prev_count:
+            means[stage] = (total - prev_total) / (count - prev_count)
+    return means
+
+
+def _latency_summary(latencies):
+    latencies = np.asarray(latencies)
+    return {
+        'mean': float(latencies.mean()),
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95)),
+        'p99': float(np.percentile(latencies, 99)),
+        'max': float(latencies.max()),
+    }
+
+
+def run_case(detectors, payloads, concurrency, warmup=3):
+    """Push every payload through process_frame on `concurrency` threads"""
+    replicas = queue.Queue()
+    for detector in detectors[:concurrency]:
+        replicas.put(detector)
+
+    def process(payload):
+        detector = replicas.get()
+        try:
+            start = time.perf_counter()
+            detector.process_frame(payload)
+            return (time.perf_counter() - start) * 1000
+        finally:
+            replicas.put(detector)
+
+    for detector in detectors[:concurrency]:
+        for payload in payloads[:warmup]:
+            detector.process_frame(payload)
+
+    decode_ms = []
+    for payload in payloads:
+        start = time.perf_counter()
+        decode_frame(payload)
+        decode_ms.append((time.perf_counter() - start) * 1000)
+
+    before = _stage_snapshot()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(process, payloads))
+    wall = time.perf_counter() - start
+
+    stages = _stage_means(before, _stage_snapshot())
+    stages['decode'] = float(np.mean(decode_ms))
+    return {
+        'frames': len(payloads),
+        'fps': len(payloads) / wall,
+        'latency_ms': _latency_summary(latencies),
+        'stage_mean_ms': stages,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run(frames, resolutions, concurrency_levels, data_url=False, warmup=3):
+    from objectDetection import ObjectDetector
+
+    detectors = [ObjectDetector() for _ in range(max(concurrency_levels))]
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'payload': 'dataurl' if data_url else 'binary',
+        'runs': [],
+    }
+    for resolution in resolutions:
+        payloads = encode_frames(frames, resolution, data_url=data_url)
+        for concurrency in concurrency_levels:
+            result = run_case(detectors, payloads, concurrency, warmup)
+            report['runs'].append({
+                'resolution': f'{resolution[0]}x{resolution[1]}',
+                'concurrency': concurrency,
+                **result,
+            })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', help='folder of images to replay (default: synthetic frames)')
+    parser.add_argument('--count', type=int, default=100, help='frames to replay')
+    parser.add_argument('--resolutions', type=parse_resolution, nargs='+',
+                        default=[parse_resolution('640x480'), parse_resolution('1280x720')])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1])
+    parser.add_argument('--dataurl', action='store_true', help='send base64 data URLs like legacy clients')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    if args.frames:
+        from inferenceBackend import load_frames
+        frames = load_frames(args.frames, args.count)
+    else:
+        frames = synthetic_frames(args.count)
+
+    report = run(frames, args.resolutions, args.concurrency, args.dataurl, args.warmup)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,99 @@
+# benchmarks/fusion_bench.py
+"""Compare fuse_detections with the old pairwise remove_overlapping_detections.
+
+Run from the backend directory:  python -m benchmarks.fusion_bench
+"""
+import argparse
+import json
+import timeit
+
+import numpy as np
+
+from detectionFusion import fuse_detections
+from detectionPostprocess import DetectionArrays
+
+
+def calculate_iou(box1, box2):
+    x1 = max(box1[0], box2[0])
+    y1 = max(box1[1], box2[1])
+    x2 = min(box1[2], box2[2])
+    y2 = min(box1[3], box2[3])
+
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
+    area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
+    union = area1 + area2 - intersection
+
+    return intersection / union if union > 0 else 0
+
+
+def remove_overlapping_detections(detections, iou_threshold=0.5):
+    """The per-pair Python loop ObjectDetector used before fuse_detections"""
+    if not detections:
+        return []
+
+    detections = sorted(detections, key=lambda x: x['confidence'], reverse=True)
+    kept_detections = []
+
+    for detection in detections:
+        should_keep = True
+        for kept in kept_detections:
+            if calculate_iou(detection['box'], kept['box']) > iou_threshold:
+                should_keep = False
+                break
+        if should_keep:
+            kept_detections.append(detection)
+
+    return kept_detections
+
+
+def synthetic_detections(n, num_classes=8, width=1280, height=720, seed=0):
+    """Random boxes clustered around a few centres so that many of them overlap"""
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform([0, 0], [width, height], size=(max(n // 4, 1), 2))
+    xy = centres[rng.integers(len(centres), size=n)] + rng.normal(0, 15, size=(n, 2))
+    wh = rng.uniform(30, 200, size=(n, 2))
+    boxes = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1).astype(np.float32)
+    return DetectionArrays(
+        boxes,
+        rng.uniform(0.25, 1.0, size=n).astype(np.float32),
+        rng.integers(num_classes, size=n).astype(np.int32),
+        rng.integers(2, size=n).astype(np.uint8),
+        np.full(n, np.nan, dtype=np.float32),
+    )
+
+
+def _best_of(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+
+def run(sizes, repeat):
+    report = []
+    for n in sizes:
+        detections = synthetic_detections(n)
+        records = [{'box': box, 'confidence': conf}
+                   for box, conf in zip(detections.boxes.astype(int).tolist(),
+                                        detections.confidence.tolist())]
+        row = {
+            'boxes': n,
+            'legacy_ms': _best_of(lambda: remove_overlapping_detections(records), repeat),
+        }
+        for method in ('nms', 'soft_nms', 'wbf'):
+            row[f'{method}_ms'] = _best_of(
+                lambda: fuse_detections(detections, method), repeat)
+        row['nms_class_agnostic_ms'] = _best_of(
+            lambda: fuse_detections(detections, 'nms', class_aware=False), repeat)
+        report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,67 @@
+# benchmarks/test_detector_bench.py
+"""pytest-benchmark suite for the per-frame detection path.
+
+Run from the backend directory and keep the JSON for comparisons across commits:
+    pytest benchmarks --benchmark-only --benchmark-json=bench.json
+    pytest-benchmark compare bench-old.json bench.json
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+np = pytest.importorskip('numpy')
+
+from benchmarks.fusion_bench import synthetic_detections  # noqa: E402
+from detectionFusion import fuse_detections  # noqa: E402
+
+RESOLUTIONS = ['640x480', '1280x720']
+
+
+@pytest.fixture(scope='module')
+def frames():
+    pytest.importorskip('cv2')
+    from benchmarks.detector_bench import synthetic_frames
+    return synthetic_frames(8)
+
+
+@pytest.fixture(scope='module')
+def detector():
+    pytest.importorskip('ultralytics')
+    from objectDetection import ObjectDetector
+    return ObjectDetector()
+
+
+def _payloads(frames, resolution, data_url=False):
+    from benchmarks.detector_bench import encode_frames, parse_resolution
+    return encode_frames(frames, parse_resolution(resolution), data_url=data_url)
+
+
+def _cycle(func, payloads):
+    state = {'i': 0}
+
+    def run():
+        payload = payloads[state['i'] % len(payloads)]
+        state['i'] += 1
+        return func(payload)
+    return run
+
+
+@pytest.mark.parametrize('resolution', RESOLUTIONS)
+@pytest.mark.parametrize('data_url', [False, True], ids=['binary', 'dataurl'])
+def test_decode(benchmark, frames, resolution, data_url):
+    from frameDecoder import decode_frame_for_size
+    payloads = _payloads(frames, resolution, data_url)
+    benchmark(_cycle(lambda payload: decode_frame_for_size(payload, 640), payloads))
+
+
+@pytest.mark.parametrize('resolution', RESOLUTIONS)
+def test_process_frame(benchmark, detector, frames, resolution):
+    payloads = _payloads(frames, resolution)
+    detector.process_frame(payloads[0])  # warm-up
+    benchmark(_cycle(detector.process_frame, payloads))
+
+
+@pytest.mark.parametrize('method', ['nms', 'soft_nms', 'wbf'])
+@pytest.mark.parametrize('boxes', [10, 100])
+def test_fusion(benchmark, method, boxes):
+    detections = synthetic_detections(boxes)
+    benchmark(fuse_detections, detections, method)
@@ -0,0 +1,64 @@
+# classFilter.py
+import numpy as np
+
+# Speech entity values that don't match a detector label by name
+ENTITY_ALIASES = {
+    'transjakarta': ('transjakarta_bus', 'halte'),
+    'busway': ('transjakarta_bus', 'halte'),
+    'bus stop': ('halte',),
+    'kereta': ('train',),
+    'mrt': ('train',),
+    'krl': ('train',),
+    'motor': ('motorcycle',),
+    'mobil': ('car',),
+    'lubang': ('pothole',),
+    'guiding block': ('tactile_path',),
+}
+
+
+def _normalize(label):
+    return label.strip().lower().replace('_', ' ').replace('-', ' ')
+
+
+def _check_list(name, values, item_types):
+    if values is None:
+        return []
+    if not isinstance(values, list) or not all(isinstance(v, item_types) for v in values):
+        raise ValueError(f"'{name}' must be a list of {' or '.join(t.__name__ for t in item_types)}")
+    return values
+
+
+def resolve_classes(class_table, labels=None, entities=None, always=()):
+    """Label ids a session should detect, or None to detect everything.
+
+    labels are detector labels set explicitly; entities are the speech
+    pipeline's {'type', 'value'} dicts (or bare values), matched by label
+    name or alias. Raises ValueError when either isn't a list of those.
+    The `always` labels (people, vehicles, hazards) stay on whenever a filter
+    is active. When nothing asked for resolves to a label one of the models
+    knows, the session keeps scanning everything.
+    """
+    by_name = {_normalize(label): label_id for label_id, label in enumerate(class_table.labels)}
+
+    requested = list(_check_list('labels', labels, (str,)))
+    for entity in _check_list('entities', entities, (str, dict)):
+        value = _normalize(str(entity.get('value', '') if isinstance(entity, dict) else entity))
+        requested.extend(ENTITY_ALIASES.get(value, (value,)))
+
+    ids = {by_name[_normalize(label)] for label in requested if _normalize(label) in by_name}
+    if not ids:
+        return None
+    ids.update(by_name[_normalize(label)] for label in always if _normalize(label) in by_name)
+    return np.array(sorted(ids), dtype=np.int32)
+
+
+def union_classes(class_sets):
+    """Label ids needed by a batch of frames, None if any frame wants everything"""
+    if any(classes is None for classes in class_sets):
+        return None
+    return np.unique(np.concatenate(class_sets))
+
+
+def model_classes(class_table, source_index, label_ids):
+    """A model's own class indices for a set of shared label ids (ultralytics' classes=)"""
+    return np.flatnonzero(np.isin(class_table.lookup[source_index], label_ids)).tolist()
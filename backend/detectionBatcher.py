@@ -0,0 +1,152 @@
+# detectionBatcher.py
+import asyncio
+import collections
+import time
+
+from detectionMetrics import Histogram, BATCH_SIZE_BUCKETS, LATENCY_MS_BUCKETS
+
+
+class BatchingDispatcher:
+    """Gathers frames from every websocket into micro-batches for the detector pool.
+
+    A batch is dispatched when it reaches max_batch_size or when its oldest
+    frame has waited window_ms. While every replica is busy frames keep
+    accumulating, so batches grow with load. Only frames requested at the
+    same inference size and for the same models are batched together; each
+    frame's active classes travel with it to the batch function.
+    """
+
+    def __init__(self, pool, batch_func, window_ms=15, max_batch_size=8):
+        self.pool = pool
+        self.batch_func = batch_func
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(LATENCY_MS_BUCKETS)
+
+        self._queue = None
+        # Frames pulled off the queue that belong to a different size's batch
+        self._deferred = collections.deque()
+        self._task = None
+        self._free_replicas = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._free_replicas = asyncio.Semaphore(self.pool.size)
+            self._task = asyncio.create_task(self._gather_batches())
+
+    async def submit(self, frame, imgsz=None, models=None, classes=None):
+        """Queue one frame and wait for its own result from the batch it lands in"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((frame, future, time.perf_counter(), (imgsz, models), classes))
+        return await future
+
+    @property
+    def queue_depth(self):
+        if self._queue is None:
+            return 0
+        return self._queue.qsize() + len(self._deferred)
+
+    def _take_deferred(self, key):
+        for item in self._deferred:
+            if item[3] == key:
+                self._deferred.remove(item)
+                return item
+        return None
+
+    async def _next_item(self, key, timeout):
+        """Next queued frame for an (imgsz, models) key, deferring frames of other keys"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+            else:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+            if item[3] == key:
+                return item
+            self._deferred.append(item)
+
+    async def _gather_batches(self):
+        while True:
+            # Only start a batch when a replica can take it right away
+            await self._free_replicas.acquire()
+            if self._deferred:
+                batch = [self._deferred.popleft()]
+            else:
+                batch = [await self._queue.get()]
+            key = batch[0][3]
+            deadline = batch[0][2] + self.window
+
+            while len(batch) < self.max_batch_size:
+                item = self._take_deferred(key)
+                if item is None:
+                    item = await self._next_item(key, deadline - time.perf_counter())
+                if item is None:
+                    break
+                batch.append(item)
+
+            # Skip frames whose connection went away while they were queued
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                self._free_replicas.release()
+                continue
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        now = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        for _, _, enqueued, _, _ in batch:
+            self.queue_wait_ms.observe((now - enqueued) * 1000)
+
+        try:
+            try:
+                results = await self.pool.run(
+                    self.batch_func, [item[0] for item in batch], *batch[0][3],
+                    [item[4] for item in batch])
+            except Exception:
+                if len(batch) == 1:
+                    raise
+                # Find the frame that broke the batch so only its connection sees the error
+                await self._dispatch_each(batch)
+                return
+            for (_, future, _, _, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._free_replicas.release()
+
+    async def _dispatch_each(self, batch):
+        for frame, future, _, key, classes in batch:
+            try:
+                result = (await self.pool.run(self.batch_func, [frame], *key, [classes]))[0]
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'batch_size': self.batch_size.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot(),
+            'queue_depth': self.queue_depth,
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,181 @@
+# detectionConfig.py
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_cpus(name):
+    """Parse a comma-separated list of CPU ids, e.g. '0,1,2,3'"""
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return None
+    return [int(cpu) for cpu in value.split(',') if cpu.strip()]
+
+
+# Model weights
+STANDARD_MODEL_PATH = os.environ.get('STANDARD_MODEL_PATH', './yolov8n.pt')
+CUSTOM_MODEL_PATH = os.environ.get('CUSTOM_MODEL_PATH', './yolov8-finetuned-bmth.pt')
+
+# How the standard and fine-tuned models are executed for each frame:
+#   'sequential' - one after the other on the calling thread
+#   'thread'     - concurrently, each model on its own worker thread
+#   'process'    - concurrently, each model in its own worker process
+MODEL_EXECUTION_MODE = os.environ.get('MODEL_EXECUTION_MODE', 'sequential')
+
+# CPU thread budget for each model worker (0 keeps the torch default). Only
+# allowed in 'process' mode, like the CPU sets below: torch's thread count is
+# process-wide, so 'sequential' and 'thread' models share the replica's
+# DETECTOR_TORCH_THREADS budget instead.
+STANDARD_MODEL_THREADS = _env_int('STANDARD_MODEL_THREADS', 0)
+CUSTOM_MODEL_THREADS = _env_int('CUSTOM_MODEL_THREADS', 0)
+
+# Optional CPU ids each model worker is pinned to (Linux only)
+STANDARD_MODEL_CPUS = _env_cpus('STANDARD_MODEL_CPUS')
+CUSTOM_MODEL_CPUS = _env_cpus('CUSTOM_MODEL_CPUS')
+
+# Square model input size frames are letterboxed to before inference
+INFERENCE_IMGSZ = _env_int('INFERENCE_IMGSZ', 640)
+
+# Merging of standard and custom detections: 'nms', 'soft_nms' or 'wbf'
+FUSION_METHOD = os.environ.get('FUSION_METHOD', 'nms')
+FUSION_IOU_THRESHOLD = float(os.environ.get('FUSION_IOU_THRESHOLD', '0.5'))
+# Only let boxes with the same label suppress each other
+FUSION_CLASS_AWARE = os.environ.get('FUSION_CLASS_AWARE', 'true').lower() == 'true'
+
+# Number of ObjectDetector replicas (and inference threads) serving websockets
+DETECTOR_POOL_SIZE = _env_int('DETECTOR_POOL_SIZE', 1)
+# torch intra-op threads for each replica's inference thread (0 keeps the default)
+DETECTOR_TORCH_THREADS = _env_int('DETECTOR_TORCH_THREADS', 0)
+
+# Cross-connection micro-batching: frames are gathered for up to
+# BATCH_WINDOW_MS (0 disables batching) or until BATCH_MAX_SIZE frames
+BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', '15'))
+BATCH_MAX_SIZE = _env_int('BATCH_MAX_SIZE', 8)
+
+# Optional per-connection object tracking. Full detection runs every
+# TRACKING_DETECT_INTERVAL frames (0 adapts it, up to TRACKING_MAX_INTERVAL)
+# and tracked boxes are carried forward in between.
+TRACKING_ENABLED = os.environ.get('TRACKING_ENABLED', 'false').lower() == 'true'
+TRACKING_DETECT_INTERVAL = _env_int('TRACKING_DETECT_INTERVAL', 3)
+TRACKING_MAX_INTERVAL = _env_int('TRACKING_MAX_INTERVAL', 6)
+# Detections a track may miss before it is dropped
+TRACKING_MAX_AGE = _env_int('TRACKING_MAX_AGE', 5)
+
+# Optional motion gate: reuse the previous detections while the scene stays
+# unchanged (mean thumbnail change below MOTION_GATE_THRESHOLD of full scale
+# and histogram change below MOTION_GATE_HIST_THRESHOLD), for at most
+# MOTION_GATE_MAX_STALENESS_MS
+MOTION_GATE_ENABLED = os.environ.get('MOTION_GATE_ENABLED', 'false').lower() == 'true'
+MOTION_GATE_THRESHOLD = float(os.environ.get('MOTION_GATE_THRESHOLD', '0.03'))
+MOTION_GATE_HIST_THRESHOLD = float(os.environ.get('MOTION_GATE_HIST_THRESHOLD', '0.1'))
+MOTION_GATE_MAX_STALENESS_MS = float(os.environ.get('MOTION_GATE_MAX_STALENESS_MS', '1000'))
+
+# Default per-connection latency budget; clients can override it with the
+# ?latency_budget_ms= query parameter. 0 always infers at INFERENCE_IMGSZ.
+LATENCY_BUDGET_MS = float(os.environ.get('LATENCY_BUDGET_MS', '0'))
+# Input sizes the adaptive resolution may choose from
+RESOLUTION_LADDER = tuple(
+    int(size) for size in os.environ.get('RESOLUTION_LADDER', '320,416,640').split(',')
+)
+
+# Inference backend for both models: 'pytorch', 'onnx' (ONNX Runtime) or
+# 'openvino'. Non-PyTorch backends load the artifacts written to EXPORT_DIR by
+# `python inferenceBackend.py export`; INFERENCE_INT8 picks the quantized ones.
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'pytorch')
+INFERENCE_INT8 = os.environ.get('INFERENCE_INT8', 'false').lower() == 'true'
+EXPORT_DIR = os.environ.get('EXPORT_DIR', './exported')
+
+# Default websocket result encoding ('json', 'compact', 'delta' or 'none', see
+# detectionEncoding.py); clients can override it with ?results=
+RESULT_FORMAT = os.environ.get('RESULT_FORMAT', 'json')
+
+# Warm-up inferences per replica and input size before the server reports ready
+WARMUP_ITERATIONS = _env_int('WARMUP_ITERATIONS', 2)
+
+# Inference-server mode: when FRAME_RING_NAME is set, websocket workers load
+# no models and hand decoded frames to `python inferenceServer.py` through
+# this shared-memory ring. Each worker claims FRAME_RING_LANE_SLOTS of the
+# FRAME_RING_SLOTS slots; frames larger than FRAME_RING_MAX_SIDE are shrunk.
+FRAME_RING_NAME = os.environ.get('FRAME_RING_NAME', '')
+FRAME_RING_SLOTS = _env_int('FRAME_RING_SLOTS', 32)
+FRAME_RING_LANE_SLOTS = _env_int('FRAME_RING_LANE_SLOTS', 4)
+FRAME_RING_MAX_SIDE = _env_int('FRAME_RING_MAX_SIDE', 1280)
+# Model processes started by inferenceServer.py
+INFERENCE_PROCESSES = _env_int('INFERENCE_PROCESSES', 1)
+
+# Per-model cadence, e.g. 'standard:1,custom:3' runs the fine-tuned model on
+# every third frame and reuses its last detections in between. Every model
+# runs when the motion gate score reaches CADENCE_MOTION_SCORE (in units of
+# MOTION_GATE_THRESHOLD) or video motion reaches CADENCE_VIDEO_MOTION.
+MODEL_CADENCE = {
+    name.strip(): int(interval)
+    for name, interval in (
+        item.split(':') for item in os.environ.get('MODEL_CADENCE', 'standard:1,custom:1').split(',')
+        if item.strip()
+    )
+}
+CADENCE_MOTION_SCORE = float(os.environ.get('CADENCE_MOTION_SCORE', '3.0'))
+CADENCE_VIDEO_MOTION = float(os.environ.get('CADENCE_VIDEO_MOTION', '0.02'))
+
+# Labels kept in the detections whenever a session narrows them down to the
+# objects the user asked about (see classFilter.py): people, traffic, hazards
+CLASS_FILTER_ALWAYS = tuple(
+    label.strip() for label in
+    os.environ.get('CLASS_FILTER_ALWAYS', 'person,bicycle,car,motorcycle,bus,truck,pothole').split(',')
+    if label.strip()
+)
+
+# Intent gating: while the user's latest intent (posted by speech_server.py to
+# /intent) is one of INTENT_THROTTLED, i.e. one that leaves surroundings mode,
+# detection only runs at INTENT_KEEPALIVE_FPS. Any other intent, including
+# 'unknown', and sessions without an intent yet run at full rate.
+INTENT_GATE_ENABLED = os.environ.get('INTENT_GATE_ENABLED', 'true').lower() == 'true'
+INTENT_THROTTLED = tuple(
+    intent.strip() for intent in
+    os.environ.get('INTENT_THROTTLED', 'asking_for_direction,service_recommendation').split(',')
+    if intent.strip()
+)
+INTENT_KEEPALIVE_FPS = float(os.environ.get('INTENT_KEEPALIVE_FPS', '1.0'))
+# How long an intent is kept for a client without an open session, so one
+# that arrives before (or between) detection websockets still applies
+INTENT_TTL_SECONDS = float(os.environ.get('INTENT_TTL_SECONDS', '300'))
+
+# Flow control: sessions opened with ?events=flow get {"type": "flow", "fps",
+# "quality"} messages so they send frames at the rate their session can
+# actually infer them, between FLOW_MIN_FPS and FLOW_MAX_FPS, with JPEG
+# quality lowered under load. FLOW_CONTROL_ENABLED=false refuses it to all.
+FLOW_CONTROL_ENABLED = os.environ.get('FLOW_CONTROL_ENABLED', 'true').lower() == 'true'
+FLOW_MAX_FPS = float(os.environ.get('FLOW_MAX_FPS', '10'))
+FLOW_MIN_FPS = float(os.environ.get('FLOW_MIN_FPS', '1'))
+FLOW_MAX_QUALITY = float(os.environ.get('FLOW_MAX_QUALITY', '0.6'))
+FLOW_MIN_QUALITY = float(os.environ.get('FLOW_MIN_QUALITY', '0.3'))
+
+# POST /detect/batch: images per inference batch, the largest request body
+# accepted, and how much of an uploaded archive is buffered in memory before
+# it spills to a temporary file. BULK_POOL_SIZE detector replicas, loaded on
+# the first bulk request, serve only bulk requests so they never hold up
+# websocket frames (0 shares the websocket replicas instead); with a frame
+# ring, it caps how many bulk images are in the ring at once.
+BULK_BATCH_SIZE = _env_int('BULK_BATCH_SIZE', 16)
+BULK_POOL_SIZE = _env_int('BULK_POOL_SIZE', 1)
+BULK_MAX_UPLOAD_MB = _env_int('BULK_MAX_UPLOAD_MB', 512)
+BULK_SPOOL_MEMORY_MB = _env_int('BULK_SPOOL_MEMORY_MB', 64)
+
+# Hazard events: sessions opened with ?events=hazards (or every session when
+# HAZARD_EVENTS is true) get {"type": "hazards"} messages whenever one of
+# HAZARD_LABELS appears, crosses into a closer HAZARD_BANDS distance band
+# or leaves; ?results=none then turns off the per-frame detections. Band edges
+# are in meters; HazardMonitor converts the detector's distances (which come
+# out in centimetres) before comparing them, and events report meters.
+HAZARD_EVENTS = os.environ.get('HAZARD_EVENTS', 'false').lower() == 'true'
+HAZARD_LABELS = tuple(
+    label.strip() for label in
+    os.environ.get('HAZARD_LABELS', 'pothole,obstacle,stairs,transjakarta_bus').split(',')
+    if label.strip()
+)
+HAZARD_BANDS = tuple(float(edge) for edge in os.environ.get('HAZARD_BANDS', '2,5').split(','))
+HAZARD_HYSTERESIS = float(os.environ.get('HAZARD_HYSTERESIS', '0.15'))
+HAZARD_CONFIRM_FRAMES = _env_int('HAZARD_CONFIRM_FRAMES', 2)
+HAZARD_LEAVE_SECONDS = float(os.environ.get('HAZARD_LEAVE_SECONDS', '2.0'))
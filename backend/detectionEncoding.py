@@ -0,0 +1,151 @@
+# detectionEncoding.py
+import json
+import struct
+
+import numpy as np
+
+from detectionPostprocess import SOURCES
+
+# Result encodings a websocket client can ask for with ?results=
+#   'json'    - list of detection dicts (the original format)
+#   'compact' - binary message with fixed-size records for every detection
+#   'delta'   - like 'compact', but only added, moved and removed objects
+#   'none'    - no per-frame results, for clients that only want hazard events
+RESULT_FORMATS = ('json', 'compact', 'delta', 'none')
+
+MESSAGE_FULL = 1
+MESSAGE_DELTA = 2
+
+# Message type, record count, removed id count, frame sequence number
+HEADER = struct.Struct('<BxHHxxI')
+
+# One detection: box in frame pixels, confidence scaled to 0-255, NaN distance if unknown.
+# track_id is 0 when tracking is off.
+RECORD_DTYPE = np.dtype([
+    ('track_id', '<u4'),
+    ('box', '<i2', (4,)),
+    ('label_id', '<u2'),
+    ('source', 'u1'),
+    ('confidence', 'u1'),
+    ('distance', '<f4'),
+])
+
+
+def label_table_message(class_table):
+    """Text message sent once per session, before any binary result"""
+    return json.dumps({
+        'type': 'labels',
+        'labels': class_table.labels,
+        'sources': list(SOURCES),
+        'record_size': RECORD_DTYPE.itemsize,
+    })
+
+
+def _records(detections):
+    records = np.zeros(len(detections), dtype=RECORD_DTYPE)
+    if not len(detections):
+        return records
+    if detections.track_ids is not None:
+        records['track_id'] = detections.track_ids
+    records['box'] = np.clip(np.rint(detections.boxes), -32768, 32767)
+    records['label_id'] = detections.class_ids
+    records['source'] = detections.source
+    records['confidence'] = np.rint(np.clip(detections.confidence, 0.0, 1.0) * 255)
+    if detections.distance is None:
+        records['distance'] = np.nan
+    else:
+        distance = detections.distance.astype(np.float32)
+        records['distance'] = np.where(np.isfinite(distance), distance, np.nan)
+    return records
+
+
+class ResultEncoder:
+    """Serializes one session's detections in its negotiated result format.
+
+    Delta messages are relative to what was last sent for each track id, so
+    box jitter below move_threshold pixels and relative distance changes
+    below distance_tolerance are never sent. Detections without track ids
+    can't be diffed and go out as full messages even in 'delta' mode.
+    """
+
+    def __init__(self, class_table, result_format='json', move_threshold=2.0, distance_tolerance=0.05):
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format '{result_format}', expected one of {RESULT_FORMATS}")
+        self.class_table = class_table
+        self.format = result_format
+        self.move_threshold = move_threshold
+        self.distance_tolerance = distance_tolerance
+
+        self.sequence = 0
+        self.bytes_sent = 0
+        self._last_detections = None
+        self._last_payload = None
+        # Records as last sent to the client, sorted by track id
+        self._state = np.zeros(0, dtype=RECORD_DTYPE)
+
+    @property
+    def binary(self):
+        return self.format not in ('json', 'none')
+
+    def encode(self, detections):
+        """Message for a frame's detections: str for 'json', None for 'none', bytes otherwise"""
+        if self.format == 'none':
+            return None
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        if detections is self._last_detections:
+            # Reused detections (motion gate): nothing to diff or re-serialize
+            payload = self._last_payload
+            if self.format == 'delta' and detections.track_ids is not None:
+                payload = HEADER.pack(MESSAGE_DELTA, 0, 0, self.sequence)
+            elif self.binary:
+                payload = HEADER.pack(MESSAGE_FULL, len(detections), 0, self.sequence) \
+                    + payload[HEADER.size:]
+        elif self.format == 'json':
+            payload = json.dumps(detections.to_records(self.class_table), separators=(',', ':'))
+        elif self.format == 'delta' and detections.track_ids is not None:
+            payload = self._encode_delta(_records(detections))
+        else:
+            records = _records(detections)
+            self._state = np.sort(records, order='track_id')
+            payload = HEADER.pack(MESSAGE_FULL, len(records), 0, self.sequence) + records.tobytes()
+
+        self._last_detections = detections
+        self._last_payload = payload
+        self.bytes_sent += len(payload)
+        return payload
+
+    def _encode_delta(self, records):
+        records = np.sort(records, order='track_id')
+        state = self._state
+        ids = records['track_id']
+
+        index = np.searchsorted(state['track_id'], ids).clip(max=max(len(state) - 1, 0))
+        known = np.zeros(len(records), dtype=bool)
+        if len(state):
+            known = state['track_id'][index] == ids
+
+        changed = ~known
+        if len(state) and known.any():
+            previous = state[index]
+            moved = np.abs(records['box'].astype(np.int32) - previous['box']).max(axis=1) > self.move_threshold
+            old_distance, new_distance = previous['distance'], records['distance']
+            with np.errstate(invalid='ignore'):
+                distance_changed = np.where(
+                    np.isnan(old_distance) | np.isnan(new_distance),
+                    np.isnan(old_distance) != np.isnan(new_distance),
+                    np.abs(new_distance - old_distance) > self.distance_tolerance * np.abs(old_distance))
+            changed |= known & (moved | distance_changed
+                                | (records['label_id'] != previous['label_id'])
+                                | (records['source'] != previous['source']))
+
+        removed = np.setdiff1d(state['track_id'], ids, assume_unique=True).astype('<u4')
+
+        # Unchanged objects keep the values the client already has
+        new_state = records.copy()
+        if len(state):
+            new_state[known & ~changed] = state[index[known & ~changed]]
+        self._state = new_state
+
+        upserts = records[changed]
+        return (HEADER.pack(MESSAGE_DELTA, len(upserts), len(removed), self.sequence)
+                + upserts.tobytes() + removed.tobytes())
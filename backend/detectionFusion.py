@@ -0,0 +1,156 @@
+# detectionFusion.py
+import numpy as np
+
+FUSION_METHODS = ('nms', 'soft_nms', 'wbf')
+
+# Below this many boxes plain Python beats building the IoU matrix for hard NMS
+SMALL_NMS_SIZE = 16
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes as an (N, M) matrix"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union > 0, intersection / union, 0.0)
+
+
+def _overlaps(detections, class_aware):
+    iou = iou_matrix(detections.boxes, detections.boxes)
+    if class_aware:
+        # Boxes of different labels never suppress or merge with each other
+        iou[detections.class_ids[:, None] != detections.class_ids[None, :]] = 0.0
+    return iou
+
+
+def _pair_iou(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    intersection = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _small_hard_nms(detections, iou_threshold, class_aware):
+    boxes = detections.boxes.tolist()
+    class_ids = detections.class_ids.tolist()
+    keep = []
+    for i, box in enumerate(boxes):
+        if all((class_aware and class_ids[i] != class_ids[k])
+               or _pair_iou(box, boxes[k]) <= iou_threshold for k in keep):
+            keep.append(i)
+    return detections.select(np.array(keep, dtype=np.intp))
+
+
+def _hard_nms(detections, iou, iou_threshold):
+    n = len(detections)
+    suppressed = np.zeros(n, dtype=bool)
+    keep = []
+    for i in range(n):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > iou_threshold
+    return detections.select(np.array(keep, dtype=np.intp))
+
+
+def _soft_nms(detections, iou, sigma, score_threshold):
+    """Gaussian soft-NMS: overlapping boxes have their confidence decayed instead of dropped"""
+    scores = detections.confidence.astype(np.float32).copy()
+    remaining = np.ones(len(detections), dtype=bool)
+    keep = []
+    while remaining.any():
+        i = int(np.argmax(np.where(remaining, scores, -1.0)))
+        if scores[i] < score_threshold:
+            break
+        keep.append(i)
+        remaining[i] = False
+        scores[remaining] *= np.exp(-(iou[i, remaining] ** 2) / sigma)
+
+    keep = np.array(keep, dtype=np.intp)
+    fused = detections.select(keep)
+    fused.confidence = scores[keep]
+    return fused
+
+
+def _weighted_box_fusion(detections, iou, iou_threshold, num_models, score_threshold):
+    """Merge each cluster of overlapping boxes into one confidence-weighted box"""
+    n = len(detections)
+    if np.ndim(num_models):
+        # Models able to emit each box's label
+        num_models = np.maximum(np.asarray(num_models)[detections.class_ids], 1)
+    else:
+        num_models = np.full(n, max(num_models, 1))
+    assigned = np.zeros(n, dtype=bool)
+    leaders = []
+    boxes = []
+    confidence = []
+    for i in range(n):
+        if assigned[i]:
+            continue
+        members = ~assigned & (iou[i] > iou_threshold)
+        members[i] = True
+        assigned |= members
+
+        weights = detections.confidence[members]
+        leaders.append(i)
+        boxes.append((detections.boxes[members] * weights[:, None]).sum(axis=0) / weights.sum())
+        # Clusters confirmed by fewer of the models able to emit the label are down-weighted
+        confidence.append(weights.mean() * min(len(weights), num_models[i]) / num_models[i])
+
+    fused = detections.select(np.array(leaders, dtype=np.intp))
+    fused.boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    fused.confidence = np.array(confidence, dtype=np.float32)
+    return fused.select(fused.confidence >= score_threshold)
+
+
+def fuse_detections(detections, method='nms', iou_threshold=0.5, class_aware=True,
+                    sigma=0.5, score_threshold=0.25, num_models=2):
+    """Merge standard and custom detections, highest confidence first.
+
+    method is 'nms' (drop overlapping boxes), 'soft_nms' (decay their
+    confidence) or 'wbf' (average each overlapping cluster into one box).
+    With class_aware only boxes sharing a label interact, so e.g. a pothole
+    under a person is kept. WBF moves boxes, so callers should recompute
+    distances afterwards. num_models is the number of models that ran, or
+    (like ClassTable.model_counts) how many of them can emit each label id;
+    WBF scales a cluster's confidence by the share of those models in it and
+    drops fused boxes below score_threshold.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}")
+
+    order = np.argsort(-detections.confidence, kind='stable')
+    detections = detections.select(order)
+
+    if not len(detections):
+        return detections
+    if method == 'wbf':
+        # Every cluster is rescored, even a single box, so there is no fast path
+        iou = _overlaps(detections, class_aware)
+        return _weighted_box_fusion(detections, iou, iou_threshold, num_models, score_threshold)
+
+    # Fast path: nothing can overlap with a single box, or with class-aware
+    # fusion when every label appears only once
+    if len(detections) <= 1:
+        return detections
+    if class_aware and len(np.unique(detections.class_ids)) == len(detections):
+        return detections
+
+    if method == 'nms' and len(detections) <= SMALL_NMS_SIZE:
+        return _small_hard_nms(detections, iou_threshold, class_aware)
+
+    iou = _overlaps(detections, class_aware)
+    if method == 'soft_nms':
+        return _soft_nms(detections, iou, sigma, score_threshold)
+    return _hard_nms(detections, iou, iou_threshold)
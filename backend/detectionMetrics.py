@@ -0,0 +1,141 @@
+# detectionMetrics.py
+import bisect
+import threading
+
+
+class Histogram:
+    """Cumulative bucket histogram, cheap enough to observe on every frame"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'sum': total, 'count': count}
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+LATENCY_MS_BUCKETS = (1, 2.5, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000)
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """Point-in-time value, either set directly or read from a callback at scrape time"""
+
+    def __init__(self, func=None):
+        self._func = func
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._func() if self._func is not None else self._value
+
+    def snapshot(self):
+        return self.value
+
+
+_METRIC_TYPES = ((Histogram, 'histogram'), (Counter, 'counter'), (Gauge, 'gauge'))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricRegistry:
+    """Named metrics rendered in the Prometheus text exposition format.
+
+    Metrics stay plain Histogram/Counter/Gauge objects updated without any
+    registry lookup; several series can share a name with different labels.
+    """
+
+    def __init__(self):
+        self._families = {}
+
+    def register(self, name, help_text, metric, **labels):
+        metric_type = next(kind for cls, kind in _METRIC_TYPES if isinstance(metric, cls))
+        family = self._families.setdefault(name, (metric_type, help_text, []))
+        if family[0] != metric_type:
+            raise ValueError(f"Metric '{name}' is already registered as a {family[0]}")
+        family[2].append((labels, metric))
+        return metric
+
+    def histogram(self, name, help_text, buckets, **labels):
+        return self.register(name, help_text, Histogram(buckets), **labels)
+
+    def counter(self, name, help_text, **labels):
+        return self.register(name, help_text, Counter(), **labels)
+
+    def gauge(self, name, help_text, func=None, **labels):
+        return self.register(name, help_text, Gauge(func), **labels)
+
+    def series(self, name):
+        """(labels, metric) pairs registered under a name"""
+        return list(self._families.get(name, (None, None, []))[2])
+
+    def render(self):
+        lines = []
+        for name, (metric_type, help_text, series) in self._families.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, metric in series:
+                if metric_type != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(metric.snapshot())}')
+                    continue
+                snapshot = metric.snapshot()
+                for bound, count in snapshot['buckets'].items():
+                    lines.append(f'{name}_bucket{_format_labels(labels, {"le": bound})} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(snapshot["sum"])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {snapshot["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics exposed by the detection server's /metrics endpoint
+REGISTRY = MetricRegistry()
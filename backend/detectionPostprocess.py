@@ -0,0 +1,184 @@
+# detectionPostprocess.py
+import math
+
+import numpy as np
+
+# Index of each model in DetectionArrays.source
+SOURCES = ('standard', 'custom')
+
+
+class ClassTable:
+    """Maps every model's class ids onto one shared label id space.
+
+    Identical labels from different models share an id, and per-label
+    reference sizes are stored as arrays so distances can be computed for
+    all boxes at once.
+    """
+
+    def __init__(self, model_names, reference_sizes, focal_length, height_labels=()):
+        self.model_names = model_names
+        self.reference_sizes = reference_sizes
+        self.height_labels = tuple(height_labels)
+        self.labels = []
+        self.label_ids = {}
+        self.lookup = {}
+
+        for source, names in model_names.items():
+            lookup = np.zeros(max(names) + 1 if names else 0, dtype=np.int32)
+            for cls, label in names.items():
+                if label not in self.label_ids:
+                    self.label_ids[label] = len(self.labels)
+                    self.labels.append(label)
+                lookup[cls] = self.label_ids[label]
+            self.lookup[SOURCES.index(source)] = lookup
+
+        self.label_array = np.array(self.labels, dtype=object)
+        self.focal_length = focal_length
+
+        # NaN marks labels without a reference size
+        self.reference_size = np.full(len(self.labels), np.nan, dtype=np.float32)
+        self.use_height = np.zeros(len(self.labels), dtype=bool)
+        for label_id, label in enumerate(self.labels):
+            key = label.lower()
+            if key in reference_sizes:
+                self.reference_size[label_id] = reference_sizes[key]
+            self.use_height[label_id] = key in height_labels
+
+    def to_dict(self):
+        """JSON-serializable constructor arguments, for processes without the models"""
+        return {
+            'model_names': {source: {str(cls): label for cls, label in names.items()}
+                            for source, names in self.model_names.items()},
+            'reference_sizes': dict(self.reference_sizes),
+            'focal_length': self.focal_length,
+            'height_labels': list(self.height_labels),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        model_names = {source: {int(c): label for c, label in names.items()}
+                       for source, names in data['model_names'].items()}
+        return cls(model_names, data['reference_sizes'], data['focal_length'], data['height_labels'])
+
+    def model_counts(self, sources=None):
+        """Number of models (all, or the named sources) that can emit each label id"""
+        counts = np.zeros(len(self.labels), dtype=np.int32)
+        for source, lookup in self.lookup.items():
+            if sources is None or SOURCES[source] in sources:
+                counts[np.unique(lookup)] += 1
+        return counts
+
+    def to_label_ids(self, source_index, class_ids):
+        return self.lookup[source_index][class_ids]
+
+    def distances(self, class_ids, boxes):
+        """Vectorized calculate_distance: NaN where the label has no reference size"""
+        width = boxes[:, 2] - boxes[:, 0]
+        height = boxes[:, 3] - boxes[:, 1]
+        size = np.where(self.use_height[class_ids], height, width)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.reference_size[class_ids] * self.focal_length / size / 10
+
+
+class DetectionArrays:
+    """Struct-of-arrays detections: one row per box, labels as shared label ids.
+
+    track_ids is only set once detections have gone through ObjectTracker.
+    """
+
+    __slots__ = ('boxes', 'confidence', 'class_ids', 'source', 'distance', 'track_ids')
+
+    def __init__(self, boxes, confidence, class_ids, source, distance=None, track_ids=None):
+        self.boxes = boxes
+        self.confidence = confidence
+        self.class_ids = class_ids
+        self.source = source
+        self.distance = distance
+        self.track_ids = track_ids
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+                   np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint8),
+                   np.zeros(0, dtype=np.float32))
+
+    @classmethod
+    def concatenate(cls, parts):
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        has_distance = all(p.distance is not None for p in parts)
+        return cls(
+            np.concatenate([p.boxes for p in parts]),
+            np.concatenate([p.confidence for p in parts]),
+            np.concatenate([p.class_ids for p in parts]),
+            np.concatenate([p.source for p in parts]),
+            np.concatenate([p.distance for p in parts]) if has_distance else None,
+        )
+
+    def __len__(self):
+        return len(self.confidence)
+
+    def select(self, index):
+        """Subset by boolean mask or integer index array"""
+        return DetectionArrays(
+            self.boxes[index], self.confidence[index], self.class_ids[index],
+            self.source[index], None if self.distance is None else self.distance[index],
+            None if self.track_ids is None else self.track_ids[index],
+        )
+
+    def to_records(self, class_table, missing_distance=None):
+        """Build the per-detection dicts sent to clients"""
+        if not len(self):
+            return []
+        labels = class_table.label_array[self.class_ids].tolist()
+        boxes = self.boxes.astype(np.int32).tolist()
+        distance = self.distance
+        if distance is None:
+            distance = np.full(len(self), np.nan, dtype=np.float32)
+        distances = [d if math.isfinite(d) else missing_distance for d in distance.tolist()]
+        sources = [SOURCES[s] for s in self.source.tolist()]
+        records = [
+            {
+                'box': box,
+                'label': label,
+                'confidence': conf,
+                'distance': dist,
+                'source': source,
+            }
+            for box, label, conf, dist, source in zip(
+                boxes, labels, self.confidence.tolist(), distances, sources)
+        ]
+        if self.track_ids is not None:
+            for record, track_id in zip(records, self.track_ids.tolist()):
+                record['track_id'] = track_id
+        return records
+
+
+def extract_arrays(results, source_index, class_table, conf_threshold, label_ids=None):
+    """Pull boxes, confidences and classes out of ultralytics results in one transfer.
+
+    Boxes stay in the model's input space; low-confidence rows, and rows
+    whose label isn't in label_ids when given, are dropped with a single mask.
+    """
+    parts = []
+    for r in results:
+        data = r.boxes.data
+        if not len(data):
+            continue
+        data = data.cpu().numpy()
+        # Columns are xyxy, [track id], conf, cls
+        labels = class_table.to_label_ids(source_index, data[:, -1].astype(np.int32))
+        keep = data[:, -2] >= conf_threshold
+        if label_ids is not None:
+            keep &= np.isin(labels, label_ids)
+        data = data[keep]
+        parts.append(DetectionArrays(
+            data[:, :4].astype(np.float32),
+            data[:, -2].astype(np.float32),
+            labels[keep],
+            np.full(len(data), source_index, dtype=np.uint8),
+        ))
+    return DetectionArrays.concatenate(parts)
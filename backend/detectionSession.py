@@ -0,0 +1,132 @@
+# detectionSession.py
+import asyncio
+import itertools
+import time
+
+from detectionMetrics import REGISTRY
+
+# Server-wide frame counters across all sessions
+frames_received = REGISTRY.counter(
+    'mantra_frames_received_total', 'Frames received from clients')
+frames_processed = REGISTRY.counter(
+    'mantra_frames_processed_total', 'Frames detections were sent for')
+frames_dropped = REGISTRY.counter(
+    'mantra_frames_dropped_total', 'Frames replaced by a newer one before inference')
+
+
+class LatestFrameSlot:
+    """Single-frame mailbox: a new frame replaces one that hasn't been picked up yet"""
+
+    def __init__(self):
+        self._frame = None
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def put(self, frame):
+        """Store a frame, returning True if it replaced an unprocessed one"""
+        replaced = self._frame is not None
+        self._frame = frame
+        self._ready.set()
+        return replaced
+
+    async def get(self):
+        """Wait for the newest frame; returns None once the slot is closed"""
+        while self._frame is None and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        return None if self.closed else frame
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+
+class DetectionSession:
+    """Per-connection state of the detection websocket"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, frame_format='dataurl', client_id=None):
+        self.id = next(self._ids)
+        self.frame_format = frame_format
+        # Shared with the speech websocket so intents reach this session
+        self.client_id = client_id
+        self.connected_at = time.time()
+        self.slot = LatestFrameSlot()
+        # ObjectTracker / MotionGate / ResolutionController when enabled for this connection
+        self.tracker = None
+        self.motion_gate = None
+        self.resolution = None
+        # ModelCadence when some model runs less often than every frame
+        self.cadence = None
+        # IntentGate throttling detection outside of the surroundings intent
+        self.intent_gate = None
+        # FlowController recommending the client's frame rate and JPEG quality
+        self.flow = None
+        # HazardMonitor when the client asked for hazard events
+        self.hazards = None
+        # VideoStreamDecoder for video stream formats (fmp4/webm/h264)
+        self.video_decoder = None
+        # Encoder motion of the last video frame (fraction of frame width), None if unknown
+        self.last_motion = None
+        # ResultEncoder for the result format the client asked for
+        self.encoder = None
+        # Detections sent for the last frame, reused while the scene is static
+        self.last_detections = None
+        # Label ids the user asked about (classFilter.resolve_classes), None for everything
+        self.active_classes = None
+
+        self.frames_received = 0
+        self.frames_processed = 0
+        # Frames overwritten in the slot before inference got to them
+        self.frames_skipped = 0
+        self.last_latency_ms = None
+
+    def push_frame(self, frame_data):
+        if self.slot.closed:
+            return
+        self.frames_received += 1
+        frames_received.inc()
+        if self.slot.put(frame_data):
+            self.frames_skipped += 1
+            frames_dropped.inc()
+
+    def frame_processed(self, latency_ms):
+        self.frames_processed += 1
+        frames_processed.inc()
+        self.last_latency_ms = latency_ms
+
+    def stats(self):
+        stats = {
+            'id': self.id,
+            'frame_format': self.frame_format,
+            'client_id': self.client_id,
+            'connected_seconds': round(time.time() - self.connected_at, 1),
+            'frames_received': self.frames_received,
+            'frames_processed': self.frames_processed,
+            'frames_skipped': self.frames_skipped,
+            'last_latency_ms': self.last_latency_ms,
+            'tracks': len(self.tracker) if self.tracker is not None else None,
+            'motion_gate_hit_ratio': (
+                self.motion_gate.hit_ratio if self.motion_gate is not None else None),
+            'inference_imgsz': self.resolution.imgsz if self.resolution is not None else None,
+            'model_runs': self.cadence.runs if self.cadence is not None else None,
+            'intent': self.intent_gate.intent if self.intent_gate is not None else None,
+            'intent_frames_skipped': (
+                self.intent_gate.skipped if self.intent_gate is not None else 0),
+            'flow': {'fps': self.flow.fps, 'quality': self.flow.quality} if self.flow is not None else None,
+            'active_hazards': len(self.hazards) if self.hazards is not None else None,
+            'active_label_ids': (
+                self.active_classes.tolist() if self.active_classes is not None else None),
+            'result_format': self.encoder.format if self.encoder is not None else None,
+            'result_bytes_sent': self.encoder.bytes_sent if self.encoder is not None else 0,
+        }
+        if self.video_decoder is not None:
+            stats['video'] = {
+                'bytes_received': self.video_decoder.bytes_received,
+                'frames_decoded': self.video_decoder.frames_decoded,
+                'packets_dropped': self.video_decoder.packets_dropped,
+                'last_motion': self.last_motion,
+            }
+        return stats
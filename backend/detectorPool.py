@@ -0,0 +1,62 @@
+# detectorPool.py
+import asyncio
+import functools
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from modelWorkers import configure_cpu_budget
+
+
+class DetectorPool:
+    """Runs detector calls off the event loop on a fixed pool of detector replicas.
+
+    ultralytics models are not safe to share between threads, so each worker
+    thread checks out its own replica for the duration of a call.
+    """
+
+    def __init__(self, factory, size=1, torch_threads=0):
+        self.size = size
+        self.replicas = queue.Queue()
+        for _ in range(size):
+            self.replicas.put(factory())
+        # For read-only attributes shared by all replicas, e.g. class_table
+        self.reference = self.replicas.queue[0]
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=size,
+            thread_name_prefix='detector',
+            initializer=configure_cpu_budget,
+            initargs=(torch_threads,),
+        )
+        # Calls submitted but not yet finished (running or waiting for a replica)
+        self.pending = 0
+
+    def _call(self, func, args, kwargs):
+        detector = self.replicas.get()
+        try:
+            return func(detector, *args, **kwargs)
+        finally:
+            self.replicas.put(detector)
+
+    async def run(self, func, *args, **kwargs):
+        """Await func(detector, *args, **kwargs) on a free replica"""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(self._call, func, args, kwargs))
+        finally:
+            self.pending -= 1
+
+    def warm_up(self, func, *args, **kwargs):
+        """Call func(detector, *args, **kwargs) once on every replica (blocking, off the event loop)"""
+        for detector in list(self.replicas.queue):
+            self.executor.submit(func, detector, *args, **kwargs).result()
+
+    @property
+    def queue_depth(self):
+        """Calls waiting for a replica beyond the ones currently running"""
+        return max(0, self.pending - self.size)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
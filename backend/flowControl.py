@@ -0,0 +1,65 @@
+# flowControl.py
+import json
+import time
+
+
+class FlowController:
+    """Recommends a camera frame rate and JPEG quality to a client from server-side measurements.
+
+    A session infers one frame at a time, so frames sent faster than its
+    smoothed per-frame latency only get decoded to be dropped. The target fps
+    follows that latency (capped by max_fps, or by the intent keep-alive rate)
+    and JPEG quality steps down as the inference queue grows past the number
+    of workers. A message is only produced when the recommendation moved
+    noticeably, and at most every min_interval_s.
+    """
+
+    def __init__(self, max_fps=10.0, min_fps=1.0, max_quality=0.6, min_quality=0.3,
+                 smoothing=0.2, min_interval_s=1.0):
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.max_quality = max_quality
+        self.min_quality = min_quality
+        self.smoothing = smoothing
+        self.min_interval = min_interval_s
+
+        self.latency_ms = None
+        # Last recommendation sent; the client starts at max_fps
+        self.fps = max_fps
+        self.quality = None
+        self.messages_sent = 0
+        self._sent_at = 0.0
+
+    def target(self, queue_depth=0, workers=1, fps_cap=None):
+        """(fps, quality) for the current latency and server load"""
+        fps = self.max_fps if fps_cap is None else min(self.max_fps, fps_cap)
+        if self.latency_ms:
+            fps = min(fps, max(1000 / self.latency_ms, self.min_fps))
+        # Round to half frames so jitter doesn't produce new messages
+        fps = round(fps * 2) / 2
+
+        # Full quality up to half a queued frame per worker, lowest from two per worker
+        load = min(max((queue_depth / max(workers, 1) - 0.5) / 1.5, 0.0), 1.0)
+        quality = round(self.max_quality - (self.max_quality - self.min_quality) * load, 2)
+        return fps, quality
+
+    def update(self, latency_ms, queue_depth=0, workers=1, fps_cap=None):
+        """Record a processed frame; returns a flow message to send, or None"""
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+
+        now = time.monotonic()
+        if now - self._sent_at < self.min_interval:
+            return None
+        fps, quality = self.target(queue_depth, workers, fps_cap)
+        fps_moved = abs(fps - self.fps) >= max(1.0, 0.2 * self.fps)
+        quality_moved = self.quality is None or abs(quality - self.quality) >= 0.1
+        if not (fps_moved or quality_moved):
+            return None
+
+        self.fps, self.quality = fps, quality
+        self._sent_at = now
+        self.messages_sent += 1
+        return json.dumps({'type': 'flow', 'fps': fps, 'quality': quality})
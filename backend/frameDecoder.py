@@ -0,0 +1,81 @@
+# frameDecoder.py
+import base64
+
+import cv2
+import numpy as np
+
+# JPEG start-of-frame markers (baseline, progressive, ...), excluding DHT/JPG/DAC
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# libjpeg can scale by 1/2, 1/4 and 1/8 while decoding the DCT blocks
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def frame_bytes(frame_data):
+    """Raw image bytes of a binary message or base64 data URL"""
+    if isinstance(frame_data, str):
+        return base64.b64decode(frame_data[frame_data.index(',') + 1:])
+    return frame_data
+
+
+def jpeg_size(data):
+    """(height, width) read from a JPEG's start-of-frame header, or None if not a JPEG"""
+    view = memoryview(data)
+    n = len(view)
+    if n < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < n:
+        if view[i] != 0xFF:
+            i += 1
+            continue
+        marker = view[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            return (view[i + 5] << 8) | view[i + 6], (view[i + 7] << 8) | view[i + 8]
+        i += 2 + ((view[i + 2] << 8) | view[i + 3])
+    return None
+
+
+def decode_frame(frame_data):
+    """Decode a frame into BGR pixels.
+
+    Accepts raw JPEG/WebP bytes from binary messages, or a base64 data URL
+    from clients still on the text protocol.
+    """
+    # frombuffer wraps the received bytes without copying them
+    nparr = np.frombuffer(frame_bytes(frame_data), np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def decode_frame_for_size(frame_data, target_size):
+    """Decode a frame no larger than the model needs for a target_size input.
+
+    JPEGs whose longest side is at least 2x target_size are decoded at 1/2,
+    1/4 or 1/8 scale, so pixels the letterbox would throw away are never
+    produced. Returns the frame and the (height, width) of the original image
+    so boxes can be mapped back to it.
+    """
+    data = frame_bytes(frame_data)
+    nparr = np.frombuffer(data, np.uint8)
+
+    size = jpeg_size(data)
+    if size is not None and target_size:
+        for factor, flag in _REDUCED_FLAGS:
+            if max(size) // factor >= target_size:
+                frame = cv2.imdecode(nparr, flag)
+                if frame is not None and (frame.shape[0] > frame.shape[1]) != (size[0] > size[1]):
+                    size = size[::-1]  # EXIF orientation was applied while decoding
+                return frame, size
+
+    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    return frame, (frame.shape[:2] if frame is not None else None)
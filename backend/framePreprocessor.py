@@ -0,0 +1,95 @@
+# framePreprocessor.py
+import cv2
+import numpy as np
+import torch
+
+
+class LetterboxGeometry:
+    """Resize and padding applied to fit a frame of one resolution into the model input"""
+
+    __slots__ = ('orig_h', 'orig_w', 'imgsz', 'gain', 'new_w', 'new_h',
+                 'top', 'bottom', 'left', 'right')
+
+    def __init__(self, orig_h, orig_w, imgsz):
+        self.orig_h = orig_h
+        self.orig_w = orig_w
+        self.imgsz = imgsz
+
+        # Same rounding as ultralytics' LetterBox(auto=False, center=True)
+        self.gain = min(imgsz / orig_h, imgsz / orig_w)
+        self.new_w = int(round(orig_w * self.gain))
+        self.new_h = int(round(orig_h * self.gain))
+        pad_w = (imgsz - self.new_w) / 2
+        pad_h = (imgsz - self.new_h) / 2
+        self.top = int(round(pad_h - 0.1))
+        self.bottom = int(round(pad_h + 0.1))
+        self.left = int(round(pad_w - 0.1))
+        self.right = int(round(pad_w + 0.1))
+
+
+class FramePreprocessor:
+    """Letterboxes and normalizes a BGR frame once so every model can share the tensor"""
+
+    PAD_VALUE = (114, 114, 114)
+
+    def __init__(self, imgsz=640):
+        self.imgsz = imgsz
+        self._geometry_cache = {}
+
+    def geometry(self, orig_h, orig_w, imgsz=None):
+        """Return the cached letterbox geometry for an input resolution"""
+        key = (orig_h, orig_w, imgsz or self.imgsz)
+        geometry = self._geometry_cache.get(key)
+        if geometry is None:
+            geometry = LetterboxGeometry(*key)
+            self._geometry_cache[key] = geometry
+        return geometry
+
+    def letterbox(self, frame, geometry):
+        if (frame.shape[1], frame.shape[0]) != (geometry.new_w, geometry.new_h):
+            frame = cv2.resize(frame, (geometry.new_w, geometry.new_h),
+                               interpolation=cv2.INTER_LINEAR)
+        return cv2.copyMakeBorder(frame, geometry.top, geometry.bottom,
+                                  geometry.left, geometry.right,
+                                  cv2.BORDER_CONSTANT, value=self.PAD_VALUE)
+
+    def preprocess(self, frame, imgsz=None):
+        """Letterbox a BGR frame into a (1, 3, imgsz, imgsz) RGB float tensor in [0, 1].
+
+        Returns the tensor and the geometry needed to map boxes back.
+        """
+        geometry = self.geometry(frame.shape[0], frame.shape[1], imgsz)
+        canvas = self.letterbox(frame, geometry)
+        # BGR->RGB, HWC->CHW and the 1/255 scaling in a single pass
+        blob = cv2.dnn.blobFromImage(canvas, scalefactor=1 / 255.0, swapRB=True)
+        return torch.from_numpy(blob), geometry
+
+    def preprocess_batch(self, frames, imgsz=None):
+        """Letterbox frames of any resolutions into one (B, 3, imgsz, imgsz) tensor.
+
+        Returns the tensor and one geometry per frame.
+        """
+        geometries = [self.geometry(f.shape[0], f.shape[1], imgsz) for f in frames]
+        canvases = [self.letterbox(f, g) for f, g in zip(frames, geometries)]
+        blob = cv2.dnn.blobFromImages(canvases, scalefactor=1 / 255.0, swapRB=True)
+        return torch.from_numpy(blob), geometries
+
+    @staticmethod
+    def scale_boxes(boxes, geometry, source_size=None):
+        """Map (N, 4) xyxy boxes from model input space back to the original frame.
+
+        source_size is the (height, width) of the image the frame was decoded
+        from, when it was decoded at reduced scale.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+        boxes[:, [0, 2]] -= geometry.left
+        boxes[:, [1, 3]] -= geometry.top
+        boxes /= geometry.gain
+        height, width = geometry.orig_h, geometry.orig_w
+        if source_size is not None and tuple(source_size) != (height, width):
+            boxes[:, [0, 2]] *= source_size[1] / width
+            boxes[:, [1, 3]] *= source_size[0] / height
+            height, width = source_size
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        return boxes
@@ -0,0 +1,381 @@
+# frameRing.py
+"""Shared-memory frame ring between websocket workers and inference processes.
+
+One segment holds a fixed number of slots, each with room for one decoded
+BGR frame and its detections:
+
+    header | class table JSON | process status | slot table | results | pixels
+
+Every slot has exactly one writer at each point of its life, so no locks
+are needed across processes:
+
+- Slots are grouped into lanes of consecutive slots. A websocket worker
+  claims a lane with an exclusive flock on the lane's lock file and is the
+  only process that fills or frees its slots (FREE -> READY, DONE -> FREE).
+- Inference process i of n serves the slots whose index % n == i
+  (READY -> BUSY -> DONE), batching whichever of them are ready.
+
+Pixels and results are written in place, so frames are never pickled. Both
+sides poll the slot states, with a short sleep while idle.
+"""
+import asyncio
+import fcntl
+import json
+import os
+import tempfile
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+from detectionPostprocess import SOURCES, ClassTable, DetectionArrays
+
+FREE, READY, BUSY, DONE = 0, 1, 2, 3
+
+MAGIC = 0x4D524E47  # 'MRNG'
+METADATA_SIZE = 64 * 1024
+# Inference processes that haven't sent a heartbeat for this long count as dead
+HEARTBEAT_TIMEOUT = 5.0
+# Label ids a slot's class filter bitmap can hold
+MAX_LABELS = 256
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('num_slots', '<u4'),
+    ('lane_slots', '<u4'),
+    ('processes', '<u4'),
+    ('max_side', '<u4'),
+    ('max_results', '<u4'),
+    ('metadata_length', '<u4'),
+])
+
+PROCESS_DTYPE = np.dtype([
+    ('ready', 'u1'),
+    ('heartbeat', '<f8'),
+    ('frames', '<u8'),
+])
+
+SLOT_DTYPE = np.dtype([
+    ('state', 'u1'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('source_height', '<u4'),
+    ('source_width', '<u4'),
+    ('imgsz', '<u4'),        # 0 for the server default
+    ('models', 'u1'),        # bit i set to run SOURCES[i]; 0 runs every model
+    ('filtered', 'u1'),      # 1 when only the label ids in `classes` are wanted
+    ('classes', 'u1', (MAX_LABELS // 8,)),  # bitmap of wanted label ids
+    ('count', '<u4'),        # detections written back
+    ('failed', 'u1'),        # 1 when inference raised and there are no detections
+    ('submitted', '<f8'),
+    ('infer_ms', '<f4'),
+])
+
+RESULT_DTYPE = np.dtype([
+    ('box', '<f4', (4,)),
+    ('confidence', '<f4'),
+    ('class_id', '<i4'),
+    ('source', 'u1'),
+    ('distance', '<f4'),
+])
+
+
+class FrameRingUnavailable(RuntimeError):
+    """The ring exists but the inference server hasn't finished setting it up"""
+
+
+class InferenceProcessDied(RuntimeError):
+    """The inference process serving a slot stopped sending heartbeats"""
+
+
+class InferenceFailed(RuntimeError):
+    """The inference process raised on a slot's frame, so it has no detections"""
+
+
+def models_mask(models):
+    if not models:
+        return 0
+    return sum(1 << SOURCES.index(name) for name in models)
+
+
+def mask_models(mask):
+    if not mask:
+        return None
+    return tuple(name for i, name in enumerate(SOURCES) if mask & (1 << i))
+
+
+def classes_bitmap(label_ids):
+    bits = np.zeros(MAX_LABELS, dtype=bool)
+    bits[label_ids] = True
+    return np.packbits(bits)
+
+
+def bitmap_classes(bitmap):
+    return np.flatnonzero(np.unpackbits(bitmap)).astype(np.int32)
+
+
+def _align(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class FrameRing:
+    """Layout of the shared segment, created by the inference server and attached by workers"""
+
+    def __init__(self, name, num_slots=32, lane_slots=4, processes=1, max_side=1280,
+                 max_results=256, create=False):
+        self.name = name
+        if create:
+            size = self._layout(num_slots, processes, max_side, max_results)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.header = np.ndarray((), HEADER_DTYPE, self.shm.buf)
+            self.header[()] = (0, num_slots, lane_slots, processes, max_side, max_results, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Only the creator may unlink the segment (Python < 3.13 tracks attaches too)
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+            self.header = np.ndarray((), HEADER_DTYPE, self.shm.buf)
+            if self.header['magic'] != MAGIC:
+                self.shm.close()
+                raise FrameRingUnavailable(f"Frame ring '{name}' is not initialized yet")
+            self._layout(int(self.header['num_slots']), int(self.header['processes']),
+                         int(self.header['max_side']), int(self.header['max_results']))
+
+        self.num_slots = int(self.header['num_slots'])
+        self.lane_slots = int(self.header['lane_slots'])
+        self.processes = int(self.header['processes'])
+        self.max_side = int(self.header['max_side'])
+        self.max_results = int(self.header['max_results'])
+
+        buf = self.shm.buf
+        self.status = np.ndarray((self.processes,), PROCESS_DTYPE, buf, self._status_offset)
+        self.slots = np.ndarray((self.num_slots,), SLOT_DTYPE, buf, self._slots_offset)
+        self.results = np.ndarray((self.num_slots, self.max_results), RESULT_DTYPE, buf,
+                                  self._results_offset)
+        self.pixels = np.ndarray((self.num_slots, self.max_side * self.max_side * 3), np.uint8, buf,
+                                 self._pixels_offset)
+        if create:
+            self.slots['state'] = FREE
+            self.status['ready'] = 0
+
+    def _layout(self, num_slots, processes, max_side, max_results):
+        self._metadata_offset = _align(HEADER_DTYPE.itemsize)
+        self._status_offset = _align(self._metadata_offset + METADATA_SIZE)
+        self._slots_offset = _align(self._status_offset + processes * PROCESS_DTYPE.itemsize)
+        self._results_offset = _align(self._slots_offset + num_slots * SLOT_DTYPE.itemsize)
+        self._pixels_offset = _align(
+            self._results_offset + num_slots * max_results * RESULT_DTYPE.itemsize)
+        return self._pixels_offset + num_slots * max_side * max_side * 3
+
+    def publish(self, class_table):
+        """Write the class table and mark the ring usable (inference server only)"""
+        data = json.dumps(class_table.to_dict()).encode()
+        if len(data) > METADATA_SIZE:
+            raise ValueError('Class table does not fit in the frame ring metadata area')
+        if len(class_table.labels) > MAX_LABELS:
+            raise ValueError(f'The frame ring supports at most {MAX_LABELS} labels')
+        self.shm.buf[self._metadata_offset:self._metadata_offset + len(data)] = data
+        self.header['metadata_length'] = len(data)
+        self.header['magic'] = MAGIC
+
+    def class_table(self):
+        length = int(self.header['metadata_length'])
+        data = bytes(self.shm.buf[self._metadata_offset:self._metadata_offset + length])
+        return ClassTable.from_dict(json.loads(data))
+
+    def frame(self, slot):
+        """Zero-copy view of the frame stored in a slot"""
+        meta = self.slots[slot]
+        h, w = int(meta['height']), int(meta['width'])
+        return self.pixels[slot, :h * w * 3].reshape(h, w, 3)
+
+    def process_alive(self):
+        """Per inference process: warmed up and sending heartbeats"""
+        return ((self.status['ready'] == 1)
+                & (time.time() - self.status['heartbeat'] < HEARTBEAT_TIMEOUT))
+
+    def alive_processes(self):
+        return int(self.process_alive().sum())
+
+    def close(self, unlink=False):
+        # Drop the numpy views before releasing the buffer they point into
+        self.header = self.status = self.slots = self.results = self.pixels = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _lock_path(ring_name, lane):
+    return os.path.join(tempfile.gettempdir(), f'{ring_name.strip("/")}.lane{lane}.lock')
+
+
+class FrameRingClient:
+    """Websocket-worker side: submits decoded frames to its lane and awaits detections"""
+
+    def __init__(self, ring_name, poll_interval_ms=1.0, health_interval_s=0.5):
+        self.ring = FrameRing(ring_name)
+        self.class_table = self.ring.class_table()
+        self.poll_interval = poll_interval_ms / 1000
+        self.health_interval = health_interval_s
+
+        self.lane, self._lock_file = self._claim_lane()
+        start = self.lane * self.ring.lane_slots
+        self.lane_slots = list(range(start, start + self.ring.lane_slots))
+        self._reset_lane()
+
+        self._free = None
+        self._futures = {}
+        self._wakeup = None
+        self._task = None
+
+    def _claim_lane(self):
+        for lane in range(self.ring.num_slots // self.ring.lane_slots):
+            lock_file = open(_lock_path(self.ring.name, lane), 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            return lane, lock_file  # held until this process exits
+        raise RuntimeError(f"All lanes of frame ring '{self.ring.name}' are taken by other workers")
+
+    def _reset_lane(self):
+        """Take over slots a crashed previous owner may have left behind"""
+        deadline = time.monotonic() + HEARTBEAT_TIMEOUT
+        while any(self.ring.slots['state'][i] == BUSY for i in self.lane_slots):
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        self.ring.slots['state'][self.lane_slots] = FREE
+
+    @property
+    def processes(self):
+        return self.ring.processes
+
+    @property
+    def pending(self):
+        return len(self._futures)
+
+    @property
+    def queue_depth(self):
+        """Frames submitted to this lane that are not being inferred yet"""
+        states = self.ring.slots['state'][self.lane_slots]
+        return int((states == READY).sum())
+
+    def healthy(self):
+        return self.ring.alive_processes() == self.ring.processes
+
+    def start(self):
+        if self._task is None:
+            self._free = asyncio.Queue()
+            for slot in self.lane_slots:
+                self._free.put_nowait(slot)
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._collect_results())
+
+    def _check_process(self, slot):
+        if not self.ring.process_alive()[slot % self.ring.processes]:
+            raise InferenceProcessDied(
+                f"Inference process {slot % self.ring.processes} of frame ring "
+                f"'{self.ring.name}' stopped responding")
+
+    def _fill_slot(self, slot, decoded, imgsz, models, classes):
+        """Copy a frame and its request into a free slot (blocking, off the event loop)"""
+        frame, source_size = decoded
+        if source_size is None:
+            source_size = frame.shape[:2]
+        if max(frame.shape[:2]) > self.ring.max_side:
+            # Boxes are mapped back to source_size, so shrinking only costs precision
+            scale = self.ring.max_side / max(frame.shape[:2])
+            frame = cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale)),
+                               interpolation=cv2.INTER_AREA)
+
+        h, w = frame.shape[:2]
+        np.copyto(self.ring.pixels[slot, :h * w * 3].reshape(h, w, 3), frame)
+        meta = self.ring.slots[slot:slot + 1]
+        meta['height'], meta['width'] = h, w
+        meta['source_height'], meta['source_width'] = source_size
+        meta['imgsz'] = imgsz or 0
+        meta['models'] = models_mask(models)
+        meta['filtered'] = classes is not None
+        if classes is not None:
+            meta['classes'] = classes_bitmap(classes)
+        meta['submitted'] = time.time()
+
+    async def detect(self, decoded, imgsz=None, models=None, classes=None):
+        """Run one (frame, source_size) pair through the inference processes"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        slot = await self._free.get()
+        try:
+            self._check_process(slot)
+            fill = loop.run_in_executor(None, self._fill_slot, slot, decoded, imgsz, models, classes)
+            try:
+                await asyncio.shield(fill)
+            except asyncio.CancelledError:
+                # The copy keeps going; only reuse the slot once it's done
+                fill.add_done_callback(lambda _: self._free.put_nowait(slot))
+                raise
+        except Exception:
+            self._free.put_nowait(slot)
+            raise
+
+        future = loop.create_future()
+        self._futures[slot] = future
+        # The state flip publishes the slot to its inference process
+        self.ring.slots['state'][slot] = READY
+        self._wakeup.set()
+        return await future
+
+    def _read_results(self, slot):
+        count = int(self.ring.slots['count'][slot])
+        rows = self.ring.results[slot, :count].copy()
+        return DetectionArrays(
+            np.ascontiguousarray(rows['box']), rows['confidence'], rows['class_id'],
+            rows['source'], rows['distance'],
+        )
+
+    def _fail_dead_slots(self):
+        """Fail the frames waiting on inference processes that stopped responding"""
+        alive = self.ring.process_alive()
+        for slot in [s for s in self._futures if not alive[s % self.ring.processes]]:
+            future = self._futures.pop(slot)
+            self.ring.slots['state'][slot] = FREE
+            self._free.put_nowait(slot)
+            if not future.done():
+                future.set_exception(InferenceProcessDied(
+                    f"Inference process {slot % self.ring.processes} stopped responding"))
+
+    async def _collect_results(self):
+        states = self.ring.slots['state']
+        next_health_check = 0.0
+        while True:
+            if not self._futures:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            for slot in [s for s in self._futures if states[s] == DONE]:
+                future = self._futures.pop(slot)
+                failed = self.ring.slots['failed'][slot]
+                detections = None if failed else self._read_results(slot)
+                states[slot] = FREE
+                self._free.put_nowait(slot)
+                if future.done():
+                    continue
+                if failed:
+                    # An empty result would read as "nothing in front of you"
+                    future.set_exception(InferenceFailed(
+                        f"Inference process {slot % self.ring.processes} failed on a frame"))
+                else:
+                    future.set_result(detections)
+            if time.monotonic() >= next_health_check:
+                next_health_check = time.monotonic() + self.health_interval
+                self._fail_dead_slots()
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._lock_file.close()
+        self.ring.close()
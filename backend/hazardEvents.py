@@ -0,0 +1,129 @@
+# hazardEvents.py
+import math
+import time
+
+import numpy as np
+
+# ClassTable.distances() divides millimetre reference sizes by 10, so the
+# detector's distances are (roughly) centimetres
+DETECTOR_UNITS_PER_METER = 100.0
+
+
+class HazardMonitor:
+    """Turns per-frame detections of hazard labels into enter/approaching/leave events.
+
+    Each hazard (a track, or the closest object of a label when tracking is
+    off) is placed in a distance band: bands holds the band edges in meters,
+    closest first, and a hazard beyond the last edge is in no band. Detector
+    distances are converted to meters first, and events report meters too.
+    A hazard has to be seen on confirm_frames frames before it 'enter's,
+    emits 'approaching' when it crosses into a closer band, and 'leave's once
+    it hasn't been seen for leave_after_s. Crossing an edge needs the distance
+    to clear it by a `hysteresis` fraction, so a hazard hovering at an edge
+    doesn't flap.
+    """
+
+    def __init__(self, class_table, labels, bands=(2.0, 5.0), hysteresis=0.15,
+                 confirm_frames=2, leave_after_s=2.0):
+        self.class_table = class_table
+        self.label_ids = np.array(
+            [class_table.label_ids[label] for label in labels if label in class_table.label_ids],
+            dtype=np.int32)
+        self.bands = tuple(sorted(bands))
+        self.hysteresis = hysteresis
+        self.confirm_frames = confirm_frames
+        self.leave_after = leave_after_s
+
+        # Hazard key -> state; keys are track ids, or ('label', id) without tracking
+        self._hazards = {}
+        self.events_sent = 0
+
+    def __len__(self):
+        return sum(1 for state in self._hazards.values() if state['announced'])
+
+    def _initial_band(self, distance):
+        if not math.isfinite(distance):
+            return len(self.bands)
+        return next((i for i, edge in enumerate(self.bands) if distance < edge), len(self.bands))
+
+    def _next_band(self, band, distance):
+        if not math.isfinite(distance):
+            return band
+        while band > 0 and distance < self.bands[band - 1] * (1 - self.hysteresis):
+            band -= 1
+        while band < len(self.bands) and distance > self.bands[band] * (1 + self.hysteresis):
+            band += 1
+        return band
+
+    def _observations(self, detections):
+        """(key, label_id, distance in meters, box) for the hazards in a frame's detections"""
+        if not len(detections) or not len(self.label_ids):
+            return []
+        hazards = detections.select(np.isin(detections.class_ids, self.label_ids))
+        if not len(hazards):
+            return []
+        if hazards.distance is None:
+            distance = np.full(len(hazards), np.nan, dtype=np.float32)
+        else:
+            distance = hazards.distance / DETECTOR_UNITS_PER_METER
+
+        if hazards.track_ids is not None:
+            keys = hazards.track_ids.tolist()
+            rows = range(len(hazards))
+        else:
+            # Without track ids only the closest object of each label is followed
+            order = np.argsort(np.where(np.isfinite(distance), distance, np.inf), kind='stable')
+            _, first = np.unique(hazards.class_ids[order], return_index=True)
+            rows = order[first].tolist()
+            keys = [('label', int(hazards.class_ids[i])) for i in rows]
+        return [
+            (key, int(hazards.class_ids[i]), float(distance[i]), hazards.boxes[i])
+            for key, i in zip(keys, rows)
+        ]
+
+    def _event(self, kind, key, state):
+        band = state['band']
+        return {
+            'event': kind,
+            'id': key if not isinstance(key, tuple) else None,
+            'label': self.class_table.labels[state['label_id']],
+            'distance': round(state['distance'], 2) if math.isfinite(state['distance']) else None,
+            # Upper edge of the hazard's band in meters, None beyond the last one
+            'band': self.bands[band] if band < len(self.bands) else None,
+            'box': [int(v) for v in state['box']],
+        }
+
+    def update(self, detections, now=None):
+        """Events caused by one frame's detections (usually none)"""
+        now = time.monotonic() if now is None else now
+        events = []
+        for key, label_id, distance, box in self._observations(detections):
+            state = self._hazards.get(key)
+            if state is None:
+                state = self._hazards[key] = {
+                    'label_id': label_id, 'band': self._initial_band(distance),
+                    'seen': 0, 'announced': False,
+                }
+            state.update(label_id=label_id, distance=distance, box=box, last_seen=now)
+            state['seen'] += 1
+
+            band = self._next_band(state['band'], distance)
+            if not state['announced']:
+                state['band'] = band
+                if state['seen'] >= self.confirm_frames:
+                    state['announced'] = True
+                    events.append(self._event('enter', key, state))
+            elif band != state['band']:
+                closer = band < state['band']
+                state['band'] = band
+                if closer:
+                    events.append(self._event('approaching', key, state))
+
+        for key, state in list(self._hazards.items()):
+            if now - state['last_seen'] > self.leave_after:
+                del self._hazards[key]
+                if state['announced']:
+                    events.append(self._event('leave', key, state))
+
+        self.events_sent += len(events)
+        return events
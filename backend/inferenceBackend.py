@@ -0,0 +1,291 @@
+# inferenceBackend.py
+"""Export the detectors to ONNX Runtime / OpenVINO and compare them with PyTorch.
+
+The exported artifacts are loaded through ultralytics' YOLO class like the
+.pt weights, so ObjectDetector only needs the path that resolve_weights()
+returns for the configured INFERENCE_BACKEND.
+
+Optional dependencies: onnx + onnxruntime for 'onnx', openvino + nncf for
+'openvino' (only needed for INT8).
+
+Usage, from the backend directory:
+    python inferenceBackend.py export --backend onnx --int8 --calibration ./frames
+    python inferenceBackend.py compare --frames ./frames --output report.json \
+        --markdown inference_backends.md
+
+The comparison report itself is a follow-up: the detector weights and the
+evaluation frames aren't in the repository, so no numbers have been
+produced yet. Run `compare` where both are available and commit the
+Markdown report next to this file.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detectionConfig import (
+    STANDARD_MODEL_PATH, CUSTOM_MODEL_PATH, INFERENCE_IMGSZ, EXPORT_DIR,
+)
+from detectionFusion import iou_matrix
+from framePreprocessor import FramePreprocessor
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.webp')
+
+
+def resolve_weights(weights, backend='pytorch', int8=False, export_dir=EXPORT_DIR):
+    """Path of the model artifact to load for a backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+    if backend == 'pytorch':
+        return weights
+    suffix = '-int8' if int8 else ''
+    stem = Path(weights).stem
+    if backend == 'onnx':
+        return str(Path(export_dir) / f'{stem}{suffix}.onnx')
+    return str(Path(export_dir) / f'{stem}{suffix}_openvino_model')
+
+
+def load_frames(folder, limit=None):
+    """BGR frames from a folder of images, in name order"""
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(folder, pattern)))
+    frames = []
+    for path in paths[:limit]:
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is not None:
+            frames.append(frame)
+    if not frames:
+        raise ValueError(f"No images found in {folder}")
+    return frames
+
+
+def calibration_inputs(frames, imgsz):
+    """Model inputs for INT8 calibration, preprocessed exactly like in production"""
+    preprocessor = FramePreprocessor(imgsz)
+    for frame in frames:
+        yield preprocessor.preprocess(frame)[0].numpy()
+
+
+def export_onnx(weights, export_dir, imgsz, calibration_frames=None):
+    """Export weights to ONNX, plus a statically quantized INT8 copy if frames are given"""
+    from ultralytics import YOLO
+
+    os.makedirs(export_dir, exist_ok=True)
+    # Dynamic axes so adaptive resolution and micro-batching keep working
+    exported = YOLO(weights).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    fp32_path = resolve_weights(weights, 'onnx', False, export_dir)
+    shutil.move(exported, fp32_path)
+    outputs = [fp32_path]
+
+    if calibration_frames is not None:
+        outputs.append(quantize_onnx(fp32_path, resolve_weights(weights, 'onnx', True, export_dir),
+                                     calibration_frames, imgsz))
+    return outputs
+
+
+def quantize_onnx(fp32_path, int8_path, frames, imgsz):
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    model = onnx.load(fp32_path)
+    input_name = model.graph.input[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.inputs = calibration_inputs(frames, imgsz)
+
+        def get_next(self):
+            blob = next(self.inputs, None)
+            return None if blob is None else {input_name: blob}
+
+    prepared_path = int8_path + '.prep.onnx'
+    quant_pre_process(fp32_path, prepared_path)
+    quantize_static(
+        prepared_path, int8_path, FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax,
+        # The detection head's box decoding is sensitive to quantization
+        op_types_to_quantize=['Conv'],
+    )
+    os.remove(prepared_path)
+
+    # Keep the ultralytics metadata (class names, stride, imgsz)
+    quantized = onnx.load(int8_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, int8_path)
+    return int8_path
+
+
+def export_openvino(weights, export_dir, imgsz, calibration_frames=None):
+    """Export weights to OpenVINO IR, plus an NNCF INT8 copy if frames are given"""
+    from ultralytics import YOLO
+
+    os.makedirs(export_dir, exist_ok=True)
+    exported = YOLO(weights).export(format='openvino', imgsz=imgsz, dynamic=True)
+    fp32_dir = resolve_weights(weights, 'openvino', False, export_dir)
+    if os.path.abspath(exported) != os.path.abspath(fp32_dir):
+        shutil.rmtree(fp32_dir, ignore_errors=True)
+        shutil.move(exported, fp32_dir)
+    outputs = [fp32_dir]
+
+    if calibration_frames is not None:
+        outputs.append(quantize_openvino(fp32_dir, resolve_weights(weights, 'openvino', True, export_dir),
+                                         calibration_frames, imgsz))
+    return outputs
+
+
+def quantize_openvino(fp32_dir, int8_dir, frames, imgsz):
+    import nncf
+    import openvino as ov
+
+    xml_path = next(Path(fp32_dir).glob('*.xml'))
+    model = ov.Core().read_model(xml_path)
+    dataset = nncf.Dataset(list(calibration_inputs(frames, imgsz)))
+    quantized = nncf.quantize(model, dataset, preset=nncf.QuantizationPreset.MIXED,
+                              subset_size=len(frames))
+
+    os.makedirs(int8_dir, exist_ok=True)
+    ov.save_model(quantized, str(Path(int8_dir) / xml_path.name))
+    shutil.copy(Path(fp32_dir) / 'metadata.yaml', Path(int8_dir) / 'metadata.yaml')
+    return int8_dir
+
+
+def _run_variant(weights, inputs, conf_threshold):
+    from ultralytics import YOLO
+
+    model = YOLO(weights, task='detect')
+    model(inputs[0], verbose=False)  # warm-up
+    latencies, outputs = [], []
+    for tensor in inputs:
+        start = time.perf_counter()
+        results = model(tensor, verbose=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+        data = results[0].boxes.data.cpu().numpy()
+        outputs.append(data[data[:, -2] >= conf_threshold])
+    return latencies, outputs
+
+
+def _agreement(reference, candidate, iou_threshold=0.5):
+    """Greedy same-class IoU matching of candidate boxes against the PyTorch ones"""
+    matched = total_ref = total_cand = 0
+    conf_diffs = []
+    for ref, cand in zip(reference, candidate):
+        total_ref += len(ref)
+        total_cand += len(cand)
+        if not len(ref) or not len(cand):
+            continue
+        iou = iou_matrix(ref[:, :4], cand[:, :4])
+        iou[ref[:, -1][:, None] != cand[:, -1][None, :]] = 0.0
+        available = np.ones(len(cand), dtype=bool)
+        for i in np.argsort(-ref[:, -2]):
+            scores = np.where(available, iou[i], -1.0)
+            j = int(np.argmax(scores))
+            if scores[j] >= iou_threshold:
+                available[j] = False
+                matched += 1
+                conf_diffs.append(abs(float(ref[i, -2] - cand[j, -2])))
+    return {
+        'recall_vs_pytorch': matched / total_ref if total_ref else 1.0,
+        'precision_vs_pytorch': matched / total_cand if total_cand else 1.0,
+        'mean_abs_confidence_diff': float(np.mean(conf_diffs)) if conf_diffs else 0.0,
+    }
+
+
+def compare_backends(frames, imgsz, export_dir, conf_threshold=0.25):
+    """Latency and agreement with PyTorch for every exported variant of both models"""
+    preprocessor = FramePreprocessor(imgsz)
+    inputs = [preprocessor.preprocess(frame)[0] for frame in frames]
+
+    report = {'frames': len(frames), 'imgsz': imgsz, 'models': {}}
+    for name, weights in (('standard', STANDARD_MODEL_PATH), ('custom', CUSTOM_MODEL_PATH)):
+        reference_latency, reference = _run_variant(weights, inputs, conf_threshold)
+        rows = {}
+        for backend in BACKENDS:
+            for int8 in (False, True):
+                if backend == 'pytorch' and int8:
+                    continue
+                path = resolve_weights(weights, backend, int8, export_dir)
+                if not os.path.exists(path):
+                    continue
+                if backend == 'pytorch':
+                    latencies, outputs = reference_latency, reference
+                else:
+                    latencies, outputs = _run_variant(path, inputs, conf_threshold)
+                rows[backend + ('-int8' if int8 else '')] = {
+                    'p50_ms': float(np.percentile(latencies, 50)),
+                    'p95_ms': float(np.percentile(latencies, 95)),
+                    'speedup_vs_pytorch': float(np.median(reference_latency) / np.median(latencies)),
+                    **_agreement(reference, outputs),
+                }
+        report['models'][name] = rows
+    return report
+
+
+def format_report(report):
+    """Markdown table of a compare_backends report"""
+    lines = [f"Frames: {report['frames']}, input size: {report['imgsz']}", '']
+    for name, rows in report['models'].items():
+        lines += [f'### {name}', '',
+                  '| variant | p50 ms | p95 ms | speedup | recall | precision | mean abs dconf |',
+                  '|---|---|---|---|---|---|---|']
+        for variant, row in rows.items():
+            lines.append(
+                f"| {variant} | {row['p50_ms']:.1f} | {row['p95_ms']:.1f} | "
+                f"{row['speedup_vs_pytorch']:.2f}x | {row['recall_vs_pytorch']:.3f} | "
+                f"{row['precision_vs_pytorch']:.3f} | {row['mean_abs_confidence_diff']:.3f} |")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export and compare detector inference backends')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='export both models')
+    export_parser.add_argument('--backend', choices=BACKENDS[1:], default='onnx')
+    export_parser.add_argument('--int8', action='store_true', help='also write a static INT8 model')
+    export_parser.add_argument('--calibration', help='folder of our own camera frames for INT8 calibration')
+    export_parser.add_argument('--calibration-size', type=int, default=300)
+
+    compare_parser = subparsers.add_parser('compare', help='accuracy/latency report against PyTorch')
+    compare_parser.add_argument('--frames', required=True, help='folder of evaluation frames')
+    compare_parser.add_argument('--limit', type=int, default=200)
+    compare_parser.add_argument('--output', help='write the JSON report here')
+    compare_parser.add_argument('--markdown', help='also write the Markdown table here')
+
+    for sub in (export_parser, compare_parser):
+        sub.add_argument('--imgsz', type=int, default=INFERENCE_IMGSZ)
+        sub.add_argument('--export-dir', default=EXPORT_DIR)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        if args.int8 and not args.calibration:
+            parser.error('--int8 needs --calibration frames')
+        frames = load_frames(args.calibration, args.calibration_size) if args.int8 else None
+        export = export_onnx if args.backend == 'onnx' else export_openvino
+        for weights in (STANDARD_MODEL_PATH, CUSTOM_MODEL_PATH):
+            for path in export(weights, args.export_dir, args.imgsz, frames):
+                print(f"Exported {path}")
+    else:
+        report = compare_backends(load_frames(args.frames, args.limit), args.imgsz, args.export_dir)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        table = format_report(report)
+        if args.markdown:
+            with open(args.markdown, 'w') as f:
+                f.write(table + '\n')
+        print(table)
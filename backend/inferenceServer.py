@@ -0,0 +1,178 @@
+# inferenceServer.py
+"""Inference processes serving the shared-memory frame ring (see frameRing.py).
+
+Only these processes load the models; any number of websocket workers
+started with FRAME_RING_NAME set attach to the ring instead of loading
+their own detectors.
+
+Usage, from the backend directory:
+    python inferenceServer.py --processes 2
+    FRAME_RING_NAME=mantra-frames uvicorn objectDetection:app --port 8002 --workers 8
+"""
+import argparse
+import multiprocessing
+import queue
+import signal
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detectionConfig import (
+    FRAME_RING_NAME, FRAME_RING_SLOTS, FRAME_RING_LANE_SLOTS, FRAME_RING_MAX_SIDE,
+    INFERENCE_PROCESSES, BATCH_MAX_SIZE, WARMUP_ITERATIONS,
+)
+from detectionPostprocess import ClassTable
+from frameRing import (
+    FrameRing, FrameRingUnavailable, READY, BUSY, DONE, mask_models, bitmap_classes,
+)
+
+# Idle polling backs off up to this long between slot scans
+MAX_IDLE_SLEEP = 0.002
+
+
+def _write_results(ring, slot, detections):
+    count = min(len(detections), ring.max_results)
+    if len(detections) > count:
+        detections = detections.select(np.argsort(-detections.confidence)[:count])
+    rows = ring.results[slot, :count]
+    rows['box'] = detections.boxes
+    rows['confidence'] = detections.confidence
+    rows['class_id'] = detections.class_ids
+    rows['source'] = detections.source
+    rows['distance'] = detections.distance
+    ring.slots['count'][slot] = count
+    ring.slots['failed'][slot] = 0
+
+
+def _attach(ring_name, poll_interval=0.1):
+    """Attach to the ring once the parent has published the class table"""
+    while True:
+        try:
+            return FrameRing(ring_name)
+        except FrameRingUnavailable:
+            time.sleep(poll_interval)
+
+
+def serve(ring_name, index, processes, class_tables):
+    """Inference loop of process `index`: batch this process's ready slots, detect, write back.
+
+    Process 0 sends its detector's class table to the parent through the
+    class_tables queue, so the parent never has to load the models itself.
+    """
+    from objectDetection import ObjectDetector, warm_up_detector, warmup_sizes
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl+C
+    detector = ObjectDetector()
+    if index == 0:
+        class_tables.put(detector.class_table.to_dict())
+    ring = _attach(ring_name)
+    warm_up_detector(detector, warmup_sizes(), BATCH_MAX_SIZE, WARMUP_ITERATIONS)
+
+    status = ring.status[index:index + 1]
+    status['heartbeat'] = time.time()
+    status['ready'] = 1
+
+    own_slots = np.arange(index, ring.num_slots, processes)
+    states = ring.slots['state']
+    sleep = 0.0
+    while True:
+        status['heartbeat'] = time.time()
+        ready = own_slots[states[own_slots] == READY]
+        if not len(ready):
+            sleep = min(MAX_IDLE_SLEEP, sleep + 0.0002)
+            time.sleep(sleep)
+            continue
+        sleep = 0.0
+
+        # One batch per input size and model set, oldest frame first
+        ready = ready[np.argsort(ring.slots['submitted'][ready])]
+        imgsz, models = ring.slots['imgsz'][ready[0]], ring.slots['models'][ready[0]]
+        batch = ready[(ring.slots['imgsz'][ready] == imgsz)
+                      & (ring.slots['models'][ready] == models)][:BATCH_MAX_SIZE]
+        states[batch] = BUSY
+
+        decoded = [
+            (ring.frame(slot), (int(ring.slots['source_height'][slot]),
+                                int(ring.slots['source_width'][slot])))
+            for slot in batch
+        ]
+        classes = [
+            bitmap_classes(ring.slots['classes'][slot]) if ring.slots['filtered'][slot] else None
+            for slot in batch
+        ]
+        start = time.perf_counter()
+        try:
+            results = detector.detect_decoded(decoded, int(imgsz) or None, mask_models(int(models)),
+                                              classes)
+        except Exception as e:
+            print(f"Inference error: {e}")
+            results = [None] * len(batch)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for slot, detections in zip(batch, results):
+            if detections is None:
+                ring.slots['count'][slot] = 0
+                ring.slots['failed'][slot] = 1
+            else:
+                _write_results(ring, slot, detections)
+            ring.slots['infer_ms'][slot] = elapsed_ms
+            states[slot] = DONE
+        status['frames'] += len(batch)
+
+
+def main(ring_name, processes, num_slots, lane_slots, max_side):
+    try:
+        # A segment left behind by a crashed server
+        stale = shared_memory.SharedMemory(name=ring_name)
+        stale.close()
+        stale.unlink()
+    except FileNotFoundError:
+        pass
+
+    ring = FrameRing(ring_name, num_slots, lane_slots, processes, max_side, create=True)
+    context = multiprocessing.get_context('spawn')
+    class_tables = context.Queue()
+    workers = []
+    try:
+        for index in range(processes):
+            worker = context.Process(target=serve, args=(ring_name, index, processes, class_tables),
+                                     name=f'inference-{index}', daemon=True)
+            worker.start()
+            workers.append(worker)
+
+        # The models only load in the inference processes; the first one reports the labels
+        while True:
+            try:
+                class_table = ClassTable.from_dict(class_tables.get(timeout=1.0))
+                break
+            except queue.Empty:
+                if not workers[0].is_alive():
+                    raise RuntimeError('The first inference process exited while loading the models')
+        ring.publish(class_table)
+        print(f"Frame ring '{ring_name}': {num_slots} slots, {processes} inference processes")
+
+        while all(worker.is_alive() for worker in workers):
+            time.sleep(1.0)
+        print("An inference process exited, shutting down")
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(f"Inference server error: {e}")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        ring.close(unlink=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the inference processes behind the frame ring')
+    parser.add_argument('--name', default=FRAME_RING_NAME or 'mantra-frames')
+    parser.add_argument('--processes', type=int, default=INFERENCE_PROCESSES)
+    parser.add_argument('--slots', type=int, default=FRAME_RING_SLOTS)
+    parser.add_argument('--lane-slots', type=int, default=FRAME_RING_LANE_SLOTS)
+    parser.add_argument('--max-side', type=int, default=FRAME_RING_MAX_SIDE)
+    args = parser.parse_args()
+    if args.slots % args.lane_slots:
+        parser.error('--slots must be a multiple of --lane-slots')
+    main(args.name, args.processes, args.slots, args.lane_slots, args.max_side)
@@ -0,0 +1,43 @@
+# intentGate.py
+import time
+
+
+class IntentGate:
+    """Throttles detection to a keep-alive rate while the user's intent doesn't need it.
+
+    The speech server reports each classified intent. Detection runs at
+    keepalive_fps while the latest intent is one of throttled_intents (the
+    ones that leave surroundings mode), and on every frame otherwise,
+    including for unrecognised intents and before any intent arrives. The
+    keep-alive frames keep tracks and hazard warnings from going stale while
+    the user is only asking for directions.
+    """
+
+    def __init__(self, throttled_intents=('asking_for_direction', 'service_recommendation'),
+                 keepalive_fps=1.0):
+        self.throttled_intents = tuple(throttled_intents)
+        self.keepalive_interval = 1.0 / keepalive_fps if keepalive_fps > 0 else float('inf')
+
+        self.intent = None
+        self.changed_at = None
+        self._last_detect = 0.0
+        self.skipped = 0
+
+    @property
+    def full_rate(self):
+        return self.intent not in self.throttled_intents
+
+    def set_intent(self, intent):
+        """Switch to the rate of an intent type; None goes back to full rate"""
+        if intent != self.intent:
+            self.intent = intent
+            self.changed_at = time.time()
+
+    def should_detect(self):
+        """True when the next frame should go through detection"""
+        now = time.monotonic()
+        if self.full_rate or now - self._last_detect >= self.keepalive_interval:
+            self._last_detect = now
+            return True
+        self.skipped += 1
+        return False
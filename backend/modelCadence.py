@@ -0,0 +1,66 @@
+# modelCadence.py
+from detectionPostprocess import SOURCES, DetectionArrays
+
+
+class ModelCadence:
+    """Runs each model only every few frames and carries its last detections in between.
+
+    The fine-tuned model looks for slow-changing infrastructure (bus stops,
+    buses, tactile paths, potholes), so its results stay valid for several
+    frames while the standard model keeps up with people and cars. When the
+    scene moves a lot, every model runs regardless of its interval.
+
+    motion_score is compared with MotionGate.last_score (1.0 is the gate's
+    own change threshold); video_motion with the encoder's mean motion vector
+    length as a fraction of the frame width.
+    """
+
+    def __init__(self, intervals, motion_score=3.0, video_motion=0.02):
+        # Model name -> run on every n-th frame
+        self.intervals = {name: max(int(intervals.get(name, 1)), 1) for name in SOURCES}
+        self.motion_score = motion_score
+        self.video_motion = video_motion
+
+        # Frames since each model last ran, None before its first run
+        self.frames_since = {name: None for name in SOURCES}
+        self._cache = {}
+        self.runs = {name: 0 for name in SOURCES}
+        self.skips = {name: 0 for name in SOURCES}
+
+    @property
+    def enabled(self):
+        return any(interval > 1 for interval in self.intervals.values())
+
+    def high_motion(self, gate_score=None, video_motion=None):
+        return ((gate_score is not None and gate_score >= self.motion_score)
+                or (video_motion is not None and video_motion >= self.video_motion))
+
+    def select(self, gate_score=None, video_motion=None):
+        """Names of the models to run on this frame, in SOURCES order"""
+        everything = self.high_motion(gate_score, video_motion)
+        return tuple(
+            name for name in SOURCES
+            if everything or self.frames_since[name] is None
+            or self.frames_since[name] + 1 >= self.intervals[name]
+        )
+
+    def merge(self, detections, models):
+        """Cache the fresh results of the models that ran and add the cached ones of those that didn't.
+
+        Returns the detections and whether they combine fresh and cached
+        results, in which case they still need to be fused.
+        """
+        cached = []
+        for name in SOURCES:
+            if name in models:
+                self.frames_since[name] = 0
+                self.runs[name] += 1
+                self._cache[name] = detections.select(detections.source == SOURCES.index(name))
+            else:
+                self.frames_since[name] += 1
+                self.skips[name] += 1
+                if len(self._cache.get(name, ())):
+                    cached.append(self._cache[name])
+        if not cached:
+            return detections, False
+        return DetectionArrays.concatenate([detections] + cached), True
@@ -0,0 +1,145 @@
+# modelWorkers.py
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+EXECUTION_MODES = ('sequential', 'thread', 'process')
+
+# Model owned by a process worker (one model per worker process)
+_process_model = None
+
+
+def configure_cpu_budget(num_threads=0, cpus=None):
+    """Limit the calling worker to a torch thread budget and optional CPU set"""
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        # pid 0 pins the calling thread; torch's worker threads inherit it
+        os.sched_setaffinity(0, cpus)
+
+
+def _init_process_worker(weights, num_threads, cpus):
+    global _process_model
+    configure_cpu_budget(num_threads, cpus)
+    _process_model = YOLO(weights, task='detect')
+
+
+def _process_model_names():
+    return _process_model.names
+
+
+def _to_process(inputs):
+    """A preprocessed float tensor as uint8 pixels, a quarter of the bytes to pickle"""
+    if isinstance(inputs, torch.Tensor) and inputs.is_floating_point():
+        # The tensor holds uint8 pixels / 255, so this round trip is exact
+        return inputs.mul(255).round_().to(torch.uint8).numpy()
+    return inputs
+
+
+def _from_process(inputs):
+    if isinstance(inputs, np.ndarray) and inputs.ndim == 4 and inputs.shape[1] == 3:
+        return torch.from_numpy(inputs).float().div_(255)
+    return inputs
+
+
+def _run_process_model(inputs, kwargs):
+    kwargs.setdefault('classes', None)
+    inputs = _from_process(inputs)
+    start = time.perf_counter()
+    results = _process_model(inputs, **kwargs)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    # Don't ship the input image back to the parent process
+    for r in results:
+        r.orig_img = None
+    return results, elapsed_ms
+
+
+class ModelWorker:
+    """Runs one YOLO model inline, on a dedicated thread or in a dedicated process"""
+
+    def __init__(self, name, weights, mode='sequential', num_threads=0, cpus=None):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode '{mode}', expected one of {EXECUTION_MODES}")
+        if mode != 'process' and (num_threads > 0 or cpus):
+            # Sequential and thread-mode models live in the detector's process, and
+            # torch's thread count is process-wide, so one model's budget would
+            # silently replace the other's (and the replica's)
+            raise ValueError(
+                f"Per-model thread budgets and CPU sets ('{name}') need the 'process' "
+                f"execution mode; use DETECTOR_TORCH_THREADS in '{mode}' mode")
+
+        self.name = name
+        self.mode = mode
+        self.model = None
+        self.executor = None
+
+        if mode == 'process':
+            self.executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process_worker,
+                initargs=(weights, num_threads, cpus),
+            )
+            self.names = self.executor.submit(_process_model_names).result()
+        else:
+            self.model = YOLO(weights, task='detect')
+            self.names = self.model.names
+            if mode == 'thread':
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'{name}-model')
+
+    def predict(self, inputs, **kwargs):
+        """Run the model on the calling thread, returning (results, elapsed_ms)"""
+        # The predictor keeps arguments from earlier calls; a class filter must not outlive its call
+        kwargs.setdefault('classes', None)
+        start = time.perf_counter()
+        results = self.model(inputs, **kwargs)
+        return results, (time.perf_counter() - start) * 1000
+
+    def submit(self, inputs, **kwargs):
+        """Schedule the model on its worker, returning a future of (results, elapsed_ms)"""
+        if self.mode == 'process':
+            return self.executor.submit(_run_process_model, _to_process(inputs), kwargs)
+        return self.executor.submit(self.predict, inputs, **kwargs)
+
+    def __call__(self, inputs, **kwargs):
+        if self.executor is None:
+            return self.predict(inputs, **kwargs)[0]
+        return self.submit(inputs, **kwargs).result()[0]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+def run_models(workers, inputs, model_kwargs=None, **kwargs):
+    """Run several model workers on the same input and join their results.
+
+    Workers in 'thread' or 'process' mode run concurrently, so the wall time is
+    roughly that of the slowest model instead of the sum of all of them.
+    model_kwargs adds per-model arguments, e.g. {'custom': {'classes': [0, 2]}}.
+    Returns ({name: results}, {name: elapsed_ms, 'total': wall_ms}).
+    """
+    start = time.perf_counter()
+    results = {}
+    timings = {}
+    model_kwargs = model_kwargs or {}
+
+    futures = {
+        name: worker.submit(inputs, **kwargs, **model_kwargs.get(name, {}))
+        for name, worker in workers.items()
+        if worker.executor is not None
+    }
+    for name, worker in workers.items():
+        if name not in futures:
+            results[name], timings[name] = worker.predict(inputs, **kwargs, **model_kwargs.get(name, {}))
+    for name, future in futures.items():
+        results[name], timings[name] = future.result()
+
+    timings['total'] = (time.perf_counter() - start) * 1000
+    return results, timings
@@ -0,0 +1,67 @@
+# motionGate.py
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Skips inference while the camera sees the same scene.
+
+    Each frame is reduced to a tiny grayscale thumbnail and a brightness
+    histogram. If both stay close to those of the last frame that was run
+    through the detector, the cached detections are reused, but never for
+    longer than max_staleness_ms.
+    """
+
+    THUMBNAIL_SIZE = (32, 24)
+    HIST_BINS = 16
+
+    def __init__(self, threshold=0.03, hist_threshold=0.1, max_staleness_ms=1000):
+        self.threshold = threshold
+        self.hist_threshold = hist_threshold
+        self.max_staleness = max_staleness_ms / 1000
+
+        self._reference = None
+        self._reference_time = 0.0
+        # Change score of the last checked frame, 0 for an identical scene
+        self.last_score = None
+        self.checks = 0
+        self.hits = 0
+
+    @classmethod
+    def signature(cls, frame):
+        """Thumbnail and normalized histogram of a BGR frame (cheap, runs off the event loop)"""
+        gray = cv2.cvtColor(
+            cv2.resize(frame, cls.THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA),
+            cv2.COLOR_BGR2GRAY)
+        hist = cv2.calcHist([gray], [0], None, [cls.HIST_BINS], [0, 256]).ravel()
+        return gray.astype(np.float32), hist / max(hist.sum(), 1.0)
+
+    def is_static(self, signature):
+        """True when the frame can reuse the detections of the reference frame"""
+        self.checks += 1
+        if self._reference is None:
+            self.last_score = None
+            return False
+
+        thumbnail, hist = signature
+        ref_thumbnail, ref_hist = self._reference
+        pixel_change = float(np.abs(thumbnail - ref_thumbnail).mean()) / 255
+        hist_change = float(np.abs(hist - ref_hist).sum()) / 2
+        self.last_score = max(pixel_change / self.threshold, hist_change / self.hist_threshold)
+
+        fresh = time.monotonic() - self._reference_time < self.max_staleness
+        if fresh and self.last_score < 1.0:
+            self.hits += 1
+            return True
+        return False
+
+    def set_reference(self, signature):
+        """Remember the frame detections were just computed for"""
+        self._reference = signature
+        self._reference_time = time.monotonic()
+
+    @property
+    def hit_ratio(self):
+        return self.hits / self.checks if self.checks else 0.0
@@ -1,13 +1,71 @@
-from fastapi import FastAPI, WebSocket
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
-import cv2
-import numpy as np
-import base64
-from ultralytics import YOLO
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.datastructures import UploadFile
+import asyncio
+import itertools
 import json
+import math
 import os
+import tempfile
+import time
+import numpy as np
+from detectionConfig import (
+    STANDARD_MODEL_PATH, CUSTOM_MODEL_PATH, MODEL_EXECUTION_MODE,
+    STANDARD_MODEL_THREADS, CUSTOM_MODEL_THREADS,
+    STANDARD_MODEL_CPUS, CUSTOM_MODEL_CPUS, INFERENCE_IMGSZ,
+    FUSION_METHOD, FUSION_IOU_THRESHOLD, FUSION_CLASS_AWARE,
+    DETECTOR_POOL_SIZE, DETECTOR_TORCH_THREADS, BATCH_WINDOW_MS, BATCH_MAX_SIZE,
+    TRACKING_ENABLED, TRACKING_DETECT_INTERVAL, TRACKING_MAX_INTERVAL, TRACKING_MAX_AGE,
+    MOTION_GATE_ENABLED, MOTION_GATE_THRESHOLD, MOTION_GATE_HIST_THRESHOLD,
+    MOTION_GATE_MAX_STALENESS_MS, LATENCY_BUDGET_MS, RESOLUTION_LADDER,
+    INFERENCE_BACKEND, INFERENCE_INT8, RESULT_FORMAT, WARMUP_ITERATIONS, FRAME_RING_NAME,
+    MODEL_CADENCE, CADENCE_MOTION_SCORE, CADENCE_VIDEO_MOTION, CLASS_FILTER_ALWAYS,
+    INTENT_GATE_ENABLED, INTENT_THROTTLED, INTENT_KEEPALIVE_FPS, INTENT_TTL_SECONDS,
+    FLOW_CONTROL_ENABLED, FLOW_MAX_FPS, FLOW_MIN_FPS, FLOW_MAX_QUALITY, FLOW_MIN_QUALITY,
+    BULK_BATCH_SIZE, BULK_SPOOL_MEMORY_MB, BULK_POOL_SIZE, BULK_MAX_UPLOAD_MB, HAZARD_EVENTS, HAZARD_LABELS, HAZARD_BANDS,
+    HAZARD_HYSTERESIS, HAZARD_CONFIRM_FRAMES, HAZARD_LEAVE_SECONDS,
+)
+from frameDecoder import decode_frame_for_size, frame_bytes
+from framePreprocessor import FramePreprocessor
+from detectionPostprocess import SOURCES, ClassTable, DetectionArrays, extract_arrays
+from detectionFusion import fuse_detections
+from detectionSession import DetectionSession
+from detectionEncoding import ResultEncoder, label_table_message
+from detectorPool import DetectorPool
+from detectionBatcher import BatchingDispatcher
+from frameRing import FrameRingClient, FrameRingUnavailable
+from objectTracker import ObjectTracker
+from motionGate import MotionGate
+from resolutionController import ResolutionController
+from modelCadence import ModelCadence
+from classFilter import resolve_classes, union_classes, model_classes
+from intentGate import IntentGate
+from flowControl import FlowController
+from batchDetection import ARCHIVE_TYPES, iter_archive, iter_uploads
+from hazardEvents import HazardMonitor
+from videoIngest import VIDEO_FORMATS, VideoFrame, VideoStreamDecoder, video_ingest_available
+from detectionMetrics import REGISTRY, LATENCY_MS_BUCKETS
+from modelWorkers import ModelWorker, run_models
+from inferenceBackend import resolve_weights
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load and warm up in the background so /ready can answer meanwhile
+    startup = asyncio.create_task(start_detectors())
+    yield
+    startup.cancel()
+    if batcher is not None:
+        await batcher.stop()
+    if detector_pool is not None:
+        detector_pool.close()
+    if bulk_pool is not None and bulk_pool is not detector_pool:
+        bulk_pool.close()
+    if ring_client is not None:
+        await ring_client.stop()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Get allowed origins from environment variable or use default in development
 ALLOWED_ORIGINS = os.environ.get('ALLOWED_ORIGINS', 'http://localhost:3000,http://localhost:5173').split(',')
@@ -23,11 +81,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage timings for /metrics. Inference stages are observed once per
+# (micro-)batch, the others once per frame.
+STAGES = (
+    'base64_decode', 'image_decode', 'motion_signature', 'preprocess',
+    'postprocess', 'fusion', 'encode', 'send',
+)
+stage_ms = {
+    stage: REGISTRY.histogram(
+        'mantra_detection_stage_duration_milliseconds',
+        'Time spent in each frame processing stage', LATENCY_MS_BUCKETS, stage=stage)
+    for stage in STAGES
+}
+model_ms = {
+    name: REGISTRY.histogram(
+        'mantra_detection_model_duration_milliseconds',
+        'Inference time of each model per batch', LATENCY_MS_BUCKETS, model=name)
+    for name in SOURCES
+}
+frame_ms = REGISTRY.histogram(
+    'mantra_detection_frame_duration_milliseconds',
+    'Time from picking up a frame to having its detections', LATENCY_MS_BUCKETS)
+
 class ObjectDetector:
     def __init__(self):
-        # Load both models
-        self.standard_model = YOLO('./yolov8n.pt')
-        self.custom_model = YOLO('./yolov8-finetuned-bmth.pt')  # Your fine-tuned model
+        # Load both models for the configured backend (PyTorch, ONNX Runtime or
+        # OpenVINO), each on its own worker when running in parallel
+        self.standard_model = ModelWorker(
+            'standard', resolve_weights(STANDARD_MODEL_PATH, INFERENCE_BACKEND, INFERENCE_INT8),
+            MODEL_EXECUTION_MODE, STANDARD_MODEL_THREADS, STANDARD_MODEL_CPUS
+        )
+        self.custom_model = ModelWorker(  # Your fine-tuned model
+            'custom', resolve_weights(CUSTOM_MODEL_PATH, INFERENCE_BACKEND, INFERENCE_INT8),
+            MODEL_EXECUTION_MODE,
+            CUSTOM_MODEL_THREADS, CUSTOM_MODEL_CPUS
+        )
+        self.models = {'standard': self.standard_model, 'custom': self.custom_model}
+
+        # Per-model inference timings (ms) of the most recent frame
+        self.last_timings = {}
+
+        # Frames are letterboxed once and the tensor is shared by both models
+        self.preprocessor = FramePreprocessor(INFERENCE_IMGSZ)
         
         # Reference sizes for distance calculation
         self.REFERENCE_SIZES = {
@@ -45,6 +140,8 @@ class ObjectDetector:
             'halte': 15000,  # Example value
         }
         self.FOCAL_LENGTH = 600
+        # Objects whose distance is estimated from their height rather than width
+        self.HEIGHT_REFERENCE_LABELS = ['person', 'bottle', 'cup']
 
         # Define confidence thresholds
         self.CONF_THRESHOLD = 0.25
@@ -55,126 +152,858 @@ class ObjectDetector:
             **self.custom_model.names     # Your custom classes
         }
 
+        # Shared label ids and reference sizes for vectorized post-processing
+        self.class_table = ClassTable(
+            {name: model.names for name, model in self.models.items()},
+            self.REFERENCE_SIZES, self.FOCAL_LENGTH, self.HEIGHT_REFERENCE_LABELS
+        )
+
     def calculate_distance(self, label, w, h):
         """Calculate distance based on object dimensions"""
         if label.lower() in self.REFERENCE_SIZES:
             ref_size = self.REFERENCE_SIZES[label.lower()]
-            if label.lower() in ['person', 'bottle', 'cup']:
+            if label.lower() in self.HEIGHT_REFERENCE_LABELS:
                 return (ref_size * self.FOCAL_LENGTH) / h / 10
             else:
                 return (ref_size * self.FOCAL_LENGTH) / w / 10
         return None
 
-    def process_detections(self, results, is_custom_model=False):
-        """Process detection results from a single model"""
-        detections = []
-        
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                conf = float(box.conf[0])
-                
-                # Skip low confidence detections
-                if conf < self.CONF_THRESHOLD:
-                    continue
-                
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                w = x2 - x1
-                h = y2 - y1
-                
-                cls = int(box.cls[0])
-                label = r.names[cls]
-                
-                # Calculate distance if reference size exists
-                distance = self.calculate_distance(label, w, h)
-                
-                detections.append({
-                    'box': [int(x1), int(y1), int(x2), int(y2)],
-                    'label': label,
-                    'confidence': conf,
-                    'distance': distance,
-                    'source': 'custom' if is_custom_model else 'standard'
-                })
-        
+    def process_detections(self, results, is_custom_model=False, geometry=None, as_arrays=False):
+        """Process detection results from a single model.
+
+        When the model ran on a letterboxed tensor, `geometry` maps its boxes
+        back to original frame coordinates. With `as_arrays` the struct-of-arrays
+        DetectionArrays is returned instead of per-detection dicts.
+        """
+        source_index = SOURCES.index('custom' if is_custom_model else 'standard')
+        detections = extract_arrays(results, source_index, self.class_table, self.CONF_THRESHOLD)
+        detections = self.finalize_detections(detections, geometry)
+        if as_arrays:
+            return detections
+        return detections.to_records(self.class_table)
+
+    def finalize_detections(self, detections, geometry=None, source_size=None):
+        """Map boxes back to the original frame and estimate distances for all rows at once"""
+        if geometry is not None and len(detections):
+            detections.boxes = self.preprocessor.scale_boxes(detections.boxes, geometry, source_size)
+        detections.distance = self.class_table.distances(detections.class_ids, detections.boxes)
         return detections
 
+    def decode_frame(self, frame_data, imgsz=None):
+        """Decode raw image bytes or a base64 data URL, at reduced scale when the
+        model input is much smaller. Returns the frame and the original (height, width).
+        """
+        return decode_frame_for_size(frame_data, imgsz or self.preprocessor.imgsz)
+
+    def detect(self, frame, imgsz=None, source_size=None):
+        """Run both models on a decoded frame and return DetectionArrays in frame coordinates"""
+        return self.detect_batch([frame], imgsz, [source_size])[0]
+
+    def detect_batch(self, frames, imgsz=None, source_sizes=None, models=None, classes=None):
+        """Run both models once on a stacked batch of frames, one DetectionArrays per frame.
+
+        imgsz overrides the model input size (INFERENCE_IMGSZ) for this batch.
+        source_sizes gives the original (height, width) of frames that were
+        decoded at reduced scale, so boxes come back in original coordinates.
+        models restricts the batch to some of the models, by name. classes
+        gives each frame's active label ids (None for everything): the models
+        only score the union of them, and a model with none of them is skipped.
+        """
+        if source_sizes is None:
+            source_sizes = [None] * len(frames)
+        if classes is None:
+            classes = [None] * len(frames)
+
+        models = list(models or self.models)
+        # ultralytics keeps predict() arguments between calls, so an unfiltered
+        # batch has to clear the filter a previous batch set on this replica
+        model_kwargs = {name: {'classes': None} for name in models}
+        active = union_classes(classes)
+        if active is not None:
+            for name in list(models):
+                model_kwargs[name] = {
+                    'classes': model_classes(self.class_table, SOURCES.index(name), active)}
+                if not model_kwargs[name]['classes']:
+                    models.remove(name)
+        if not models:
+            return [DetectionArrays.empty() for _ in frames]
+
+        # Preprocess once and run detection with both models
+        start = time.perf_counter()
+        inputs, geometries = self.preprocessor.preprocess_batch(frames, imgsz)
+        stage_ms['preprocess'].observe((time.perf_counter() - start) * 1000)
+        results = self.run_models(inputs, models, model_kwargs)
+        for name in results:
+            model_ms[name].observe(self.last_timings[name])
+
+        # Combine detections from both models and map their boxes back once
+        start = time.perf_counter()
+        batch = []
+        for i, geometry in enumerate(geometries):
+            detections = DetectionArrays.concatenate([
+                extract_arrays(model_results[i:i + 1], SOURCES.index(name),
+                               self.class_table, self.CONF_THRESHOLD, classes[i])
+                for name, model_results in results.items()
+            ])
+            batch.append(self.finalize_detections(detections, geometry, source_sizes[i]))
+        stage_ms['postprocess'].observe((time.perf_counter() - start) * 1000)
+        return batch
+
     def process_frame(self, frame_data):
-        # Decode base64 image
-        img_bytes = base64.b64decode(frame_data.split(',')[1])
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        # Run detection with both models
-        standard_results = self.standard_model(frame)
-        custom_results = self.custom_model(frame)
-        
-        # Process detections from both models
-        standard_detections = self.process_detections(standard_results, False)
-        custom_detections = self.process_detections(custom_results, True)
-        
-        # Combine detections
-        all_detections = standard_detections + custom_detections
-        
-        # Optional: Remove overlapping detections
-        filtered_detections = self.remove_overlapping_detections(all_detections)
-        
-        return filtered_detections
+        return self.process_frames([frame_data])[0]
+
+    def process_frames(self, frames_data):
+        """Decode, detect and fuse a batch of frame payloads, returning records per frame"""
+        return [
+            detections.to_records(self.class_table)
+            for detections in self.detect_frames(frames_data)
+        ]
+
+    def detect_frames(self, frames_data):
+        """Decode, detect and fuse a batch of frame payloads into DetectionArrays per frame"""
+        decoded = [self.decode_frame(frame_data) for frame_data in frames_data]
+        return self.detect_and_fuse([frame for frame, _ in decoded], None,
+                                    [size for _, size in decoded])
+
+    def detect_and_fuse(self, frames, imgsz=None, source_sizes=None, models=None, classes=None):
+        """Detect and fuse a batch of decoded frames into DetectionArrays per frame"""
+        batch = self.detect_batch(frames, imgsz, source_sizes, models, classes)
+        num_models = self.class_table.model_counts(models or self.models)
+        start = time.perf_counter()
+        fused = [self.fuse_detections(detections, num_models) for detections in batch]
+        stage_ms['fusion'].observe((time.perf_counter() - start) * 1000)
+        return fused
+
+    def detect_decoded(self, decoded, imgsz=None, models=None, classes=None):
+        """detect_and_fuse for (frame, source_size) pairs from decode_frame_for_size"""
+        return self.detect_and_fuse([frame for frame, _ in decoded], imgsz,
+                                    [size for _, size in decoded], models, classes)
+
+    def fuse_detections(self, detections, num_models=None):
+        """Merge overlapping standard and custom detections (class-aware by default).
+
+        num_models defaults to how many of the models can emit each label.
+        """
+        if num_models is None:
+            num_models = self.class_table.model_counts()
+        fused = fuse_detections(
+            detections, FUSION_METHOD, FUSION_IOU_THRESHOLD, FUSION_CLASS_AWARE,
+            score_threshold=self.CONF_THRESHOLD, num_models=num_models
+        )
+        if FUSION_METHOD == 'wbf':
+            fused.distance = self.class_table.distances(fused.class_ids, fused.boxes)
+        return fused
+
+    def run_models(self, inputs, models=None, model_kwargs=None):
+        """Run both models (or the named ones) on a frame or preprocessed tensor,
+        concurrently unless in sequential mode. Returns {name: results}.
+        """
+        workers = self.models if not models else {name: self.models[name] for name in models}
+        results, self.last_timings = run_models(workers, inputs, model_kwargs)
+        return results
+
+# Inference runs on worker threads, each with its own detector replica, so a
+# slow frame never blocks the event loop or other clients. The pool, shared
+# class table and batcher are created by start_detectors() at startup.
+# In inference-server mode (FRAME_RING_NAME) frames go to the inference
+# processes through ring_client instead and no models are loaded here.
+# POST /detect/batch runs on bulk_pool, its own replicas (loaded by the first
+# bulk request) unless BULK_POOL_SIZE is 0.
+detector_pool = None
+bulk_pool = None
+bulk_pool_lock = asyncio.Lock()
+bulk_slots = None
+class_table = None
+batcher = None
+ring_client = None
+
+# Startup progress reported by /ready
+readiness = {'state': 'starting', 'error': None, 'warmup_ms': {}}
+
+def warmup_sizes():
+    """Every input size a frame can be inferred at"""
+    return sorted({INFERENCE_IMGSZ, *RESOLUTION_LADDER})
+
+def warm_up_detector(detector, sizes, batch_size, iterations):
+    """Run throwaway inferences so the first real frames don't pay for lazy initialization"""
+    frame = np.random.default_rng(0).integers(0, 255, size=(720, 1280, 3), dtype=np.uint8)
+    timings = {}
+    for imgsz in sizes:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            detector.detect_decoded([(frame, frame.shape[:2])], imgsz)
+        if batch_size > 1:
+            detector.detect_decoded([(frame, frame.shape[:2])] * batch_size, imgsz)
+        timings[imgsz] = (time.perf_counter() - start) * 1000
+    return timings
+
+def create_detectors():
+    pool = DetectorPool(ObjectDetector, DETECTOR_POOL_SIZE, DETECTOR_TORCH_THREADS)
+    batch_size = BATCH_MAX_SIZE if BATCH_WINDOW_MS > 0 else 1
+    timings = {}
+    pool.warm_up(lambda detector: timings.update(
+        warm_up_detector(detector, warmup_sizes(), batch_size, WARMUP_ITERATIONS)))
+    return pool, timings
+
+def attach_frame_ring(ring_name, poll_interval=0.5):
+    """Wait for inferenceServer.py to create the ring and warm up all its processes"""
+    while True:
+        try:
+            client = FrameRingClient(ring_name)
+        except (FileNotFoundError, FrameRingUnavailable):
+            time.sleep(poll_interval)
+            continue
+        while not client.healthy():
+            time.sleep(poll_interval)
+        return client
+
+async def start_detectors():
+    """Load every replica, warm it up at each input size, then mark the server ready"""
+    global detector_pool, bulk_slots, class_table, batcher, ring_client
+    start = time.perf_counter()
+    if FRAME_RING_NAME:
+        try:
+            ring_client = await asyncio.get_running_loop().run_in_executor(
+                None, attach_frame_ring, FRAME_RING_NAME)
+        except Exception as e:
+            print(f"Frame ring attach failed: {e}")
+            readiness.update(state='failed', error=str(e))
+            return
+        class_table = ring_client.class_table
+        if BULK_POOL_SIZE > 0:
+            bulk_slots = asyncio.Semaphore(BULK_POOL_SIZE)
+        readiness.update(state='ready', frame_ring=FRAME_RING_NAME, lane=ring_client.lane,
+                         startup_seconds=round(time.perf_counter() - start, 1))
+        return
+
+    try:
+        pool, timings = await asyncio.get_running_loop().run_in_executor(None, create_detectors)
+    except Exception as e:
+        print(f"Detector startup failed: {e}")
+        readiness.update(state='failed', error=str(e))
+        return
+
+    detector_pool = pool
+    class_table = pool.reference.class_table
+    # Frames from all connections are micro-batched unless BATCH_WINDOW_MS is 0
+    if BATCH_WINDOW_MS > 0:
+        batcher = BatchingDispatcher(
+            detector_pool, ObjectDetector.detect_decoded, BATCH_WINDOW_MS, BATCH_MAX_SIZE
+        )
+        REGISTRY.register('mantra_batch_size', 'Frames per inference batch', batcher.batch_size)
+        REGISTRY.register('mantra_batch_queue_wait_milliseconds',
+                          'Time frames wait to be batched', batcher.queue_wait_ms)
+
+    readiness.update(
+        state='ready',
+        warmup_ms={str(imgsz): round(ms, 1) for imgsz, ms in timings.items()},
+        startup_seconds=round(time.perf_counter() - start, 1),
+    )
+
+# Server-wide motion gate outcomes
+gate_checks = REGISTRY.counter(
+    'mantra_motion_gate_checks_total', 'Frames checked against the motion gate')
+gate_hits = REGISTRY.counter(
+    'mantra_motion_gate_hits_total', 'Frames that reused cached detections')
+
+# Frames each model didn't run on because of its cadence
+model_skips = {
+    name: REGISTRY.counter('mantra_model_frames_skipped_total',
+                           'Frames a model skipped, reusing its cached detections', model=name)
+    for name in SOURCES
+}
+
+async def run_detection(decoded, imgsz=None, models=None, classes=None):
+    """Detect objects in one (frame, source_size) pair, returning fused DetectionArrays"""
+    if ring_client is not None:
+        return await ring_client.detect(decoded, imgsz, models, classes)
+    if batcher is not None:
+        return await batcher.submit(decoded, imgsz, models, classes)
+    return (await detector_pool.run(ObjectDetector.detect_decoded, [decoded], imgsz, models,
+                                    [classes]))[0]
+
+def fuse_with_cached(detections):
+    """Fuse fresh detections with a skipped model's cached ones, like ObjectDetector.fuse_detections"""
+    fused = fuse_detections(detections, FUSION_METHOD, FUSION_IOU_THRESHOLD, FUSION_CLASS_AWARE,
+                            num_models=class_table.model_counts())
+    if FUSION_METHOD == 'wbf':
+        fused.distance = class_table.distances(fused.class_ids, fused.boxes)
+    return fused
+
+def inference_queue_depth():
+    """Frames waiting for a detector replica, across all connections"""
+    if ring_client is not None:
+        return ring_client.queue_depth
+    if detector_pool is None:
+        return 0
+    depth = detector_pool.queue_depth
+    if batcher is not None:
+        depth += batcher.queue_depth
+    return depth
+
+def inference_workers():
+    """Frames that can be inferred at the same time"""
+    if ring_client is not None:
+        return ring_client.processes
+    return detector_pool.size
+
+frames_undecodable = REGISTRY.counter(
+    'mantra_frames_undecodable_total', 'Frame payloads dropped because they are not images')
+
+def decode_for_session(frame_data, imgsz, gate):
+    """Decoded frame and motion signature of a payload; (None, None) if it isn't an image"""
+    if isinstance(frame_data, VideoFrame):
+        # Already decoded from the session's video stream
+        decoded = (frame_data.image, frame_data.image.shape[:2])
+    else:
+        start = time.perf_counter()
+        try:
+            data = frame_bytes(frame_data)
+        except ValueError:  # not a data URL, or bad base64
+            return None, None
+        if isinstance(frame_data, str):
+            stage_ms['base64_decode'].observe((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+        decoded = decode_frame_for_size(data, imgsz)
+        stage_ms['image_decode'].observe((time.perf_counter() - start) * 1000)
+        if decoded[0] is None:
+            return None, None
+
+    signature = None
+    if gate is not None:
+        start = time.perf_counter()
+        signature = gate.signature(decoded[0])
+        stage_ms['motion_signature'].observe((time.perf_counter() - start) * 1000)
+    return decoded, signature
 
-    def remove_overlapping_detections(self, detections, iou_threshold=0.5):
-        """Remove overlapping detections with lower confidence"""
-        if not detections:
-            return []
+async def detect_for_session(session: DetectionSession, frame_data):
+    """Detect objects in a frame payload, skipping inference when possible.
 
-        # Sort detections by confidence
-        detections = sorted(detections, key=lambda x: x['confidence'], reverse=True)
-        kept_detections = []
+    Frames between the tracker's full detections only propagate tracks,
+    frames the motion gate finds unchanged reuse the previous detections, and
+    models skipped by the session's cadence contribute their cached detections.
+    Returns None for a payload that can't be decoded, which is dropped before
+    it can reach a batch shared with other connections.
+    """
+    tracker = session.tracker
+    if tracker is not None and not tracker.should_detect():
+        return tracker.step()
 
-        for detection in detections:
-            should_keep = True
-            box1 = detection['box']
+    imgsz = None
+    controller = session.resolution
+    if controller is not None:
+        imgsz = controller.choose(inference_queue_depth(), inference_workers())
 
-            for kept in kept_detections:
-                box2 = kept['box']
-                iou = self.calculate_iou(box1, box2)
+    # Decode only as many pixels as the chosen input size needs
+    gate = session.motion_gate
+    if isinstance(frame_data, VideoFrame):
+        session.last_motion = frame_data.motion
+    decoded, signature = await asyncio.get_running_loop().run_in_executor(
+        None, decode_for_session, frame_data, imgsz or INFERENCE_IMGSZ, gate)
+    if decoded is None:
+        frames_undecodable.inc()
+        return None
+
+    if gate is not None and session.last_detections is not None:
+        gate_checks.inc()
+        if gate.is_static(signature):
+            gate_hits.inc()
+            return session.last_detections
+
+    models = None
+    cadence = session.cadence
+    if cadence is not None:
+        models = cadence.select(gate.last_score if gate is not None else None, session.last_motion)
+        for name in SOURCES:
+            if name not in models:
+                model_skips[name].inc()
+
+    start = time.perf_counter()
+    detections = await run_detection(decoded, imgsz, models, session.active_classes)
+    if controller is not None:
+        controller.observe(imgsz, (time.perf_counter() - start) * 1000)
+    if cadence is not None:
+        detections, needs_fusion = cadence.merge(detections, models)
+        if session.active_classes is not None:
+            # Cached detections may predate the session's current classes
+            detections = detections.select(np.isin(detections.class_ids, session.active_classes))
+        if needs_fusion:
+            detections = fuse_with_cached(detections)
+
+    if gate is not None:
+        gate.set_reference(signature)
+    if tracker is not None:
+        detections = tracker.update(detections)
+    session.last_detections = detections
+    return detections
+
+# Frame formats a client can ask for through the websocket subprotocol.
+# Clients that don't ask get the original base64 data URL text protocol.
+FRAME_SUBPROTOCOLS = {
+    'mantra.binary': 'binary',    # raw JPEG/WebP bytes in binary messages
+    'mantra.dataurl': 'dataurl',  # base64 data URLs in text messages
+    # Continuous video byte streams, decoded server-side with PyAV
+    'mantra.fmp4': 'fmp4',
+    'mantra.webm': 'webm',
+    'mantra.h264': 'h264',
+}
+
+def negotiate_frame_format(websocket: WebSocket):
+    """Pick the first frame format the client offered that we support"""
+    video_supported = video_ingest_available()
+    for subprotocol in websocket.scope.get('subprotocols', []):
+        frame_format = FRAME_SUBPROTOCOLS.get(subprotocol)
+        if frame_format is None or (frame_format in VIDEO_FORMATS and not video_supported):
+            continue
+        return subprotocol
+    return None
 
-                if iou > iou_threshold:
-                    should_keep = False
-                    break
+async def receive_frame(websocket: WebSocket):
+    """Return the next frame payload: bytes for binary messages, str for data URLs"""
+    message = await websocket.receive()
+    if message['type'] == 'websocket.disconnect':
+        raise WebSocketDisconnect(message.get('code', 1000))
+    if message.get('bytes') is not None:
+        return message['bytes']
+    return message['text']
 
-            if should_keep:
-                kept_detections.append(detection)
+# Active detection websocket sessions by id
+sessions = {}
+# Latest (intent type, time.monotonic() it arrived) per client id (None for
+# clients that don't send one), so a websocket opened after the intent starts
+# at the right detection rate. Entries of clients without an open session
+# expire after INTENT_TTL_SECONDS.
+client_intents = {}
 
-        return kept_detections
+def prune_client_intents():
+    """Forget intents of clients that have had no session for INTENT_TTL_SECONDS"""
+    connected = {session.client_id for session in sessions.values()}
+    expired = time.monotonic() - INTENT_TTL_SECONDS
+    for client_id, (_, stored_at) in list(client_intents.items()):
+        if client_id not in connected and stored_at < expired:
+            del client_intents[client_id]
 
-    def calculate_iou(self, box1, box2):
-        """Calculate Intersection over Union between two boxes"""
-        x1 = max(box1[0], box2[0])
-        y1 = max(box1[1], box2[1])
-        x2 = min(box1[2], box2[2])
-        y2 = min(box1[3], box2[3])
+intent_skips = REGISTRY.counter(
+    'mantra_intent_frames_skipped_total', 'Frames not detected because of the user intent')
 
-        intersection = max(0, x2 - x1) * max(0, y2 - y1)
-        area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union = area1 + area2 - intersection
+def _mean_flow(attribute):
+    values = [getattr(session.flow, attribute) for session in sessions.values()
+              if session.flow is not None and getattr(session.flow, attribute) is not None]
+    return sum(values) / len(values) if values else 0.0
+
+hazard_events = {
+    event: REGISTRY.counter('mantra_hazard_events_total', 'Hazard events sent to clients',
+                            event=event)
+    for event in ('enter', 'approaching', 'leave')
+}
+
+flow_messages = REGISTRY.counter(
+    'mantra_flow_messages_total', 'Flow-control messages sent to clients')
+REGISTRY.gauge('mantra_flow_target_fps', 'Mean frame rate recommended to connected clients',
+               lambda: _mean_flow('fps'))
+REGISTRY.gauge('mantra_flow_target_quality', 'Mean JPEG quality recommended to connected clients',
+               lambda: _mean_flow('quality'))
+
+result_bytes = REGISTRY.counter(
+    'mantra_result_bytes_total', 'Bytes of detection results sent to clients')
+REGISTRY.gauge('mantra_active_connections', 'Open detection websockets', lambda: len(sessions))
+REGISTRY.gauge('mantra_inference_queue_depth', 'Frames waiting for a detector replica',
+               inference_queue_depth)
+REGISTRY.gauge('mantra_ready', '1 once the detectors are loaded and warmed up',
+               lambda: int(readiness['state'] == 'ready'))
+
+def set_session_classes(session: DetectionSession, labels=None, entities=None):
+    """Narrow a session's detections to the labels/speech entities asked about (None clears it)"""
+    always = CLASS_FILTER_ALWAYS
+    if session.hazards is not None:
+        # Hazard events must keep seeing their labels whatever the user asked about
+        always += HAZARD_LABELS
+    session.active_classes = resolve_classes(class_table, labels, entities, always)
+    # Detections kept for a static scene may hold labels that are no longer wanted
+    session.last_detections = None
+    return session.active_classes
+
+def apply_control_message(session: DetectionSession, text):
+    """Handle a JSON control message sent on the detection websocket"""
+    try:
+        message = json.loads(text)
+    except ValueError:
+        print("Ignoring malformed control message")
+        return
+    if not isinstance(message, dict):
+        print("Ignoring malformed control message")
+        return
+    if message.get('type') == 'classes':
+        try:
+            set_session_classes(session, message.get('labels'), message.get('entities'))
+        except ValueError as e:
+            # A bad filter must not take the session down with it
+            print(f"Ignoring classes message: {e}")
 
-        return intersection / union if union > 0 else 0
+async def receive_frames(websocket: WebSocket, session: DetectionSession):
+    """Keep reading frames so the session's slot always holds the newest one"""
+    decoder = None
+    if session.frame_format in VIDEO_FORMATS:
+        # Decoded frames land in the slot from the decoder thread; a stream
+        # that can't be decoded closes the slot, which ends the session
+        loop = asyncio.get_running_loop()
+        decoder = VideoStreamDecoder(
+            session.frame_format,
+            lambda frame: loop.call_soon_threadsafe(session.push_frame, frame),
+            on_error=lambda error: loop.call_soon_threadsafe(session.slot.close),
+        )
+        session.video_decoder = decoder
 
-detector = ObjectDetector()
+    try:
+        while True:
+            payload = await receive_frame(websocket)
+            if isinstance(payload, str) and payload.startswith('{'):
+                apply_control_message(session, payload)
+            elif decoder is not None:
+                decoder.feed(payload)
+            else:
+                session.push_frame(payload)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Receive error: {e}")
+    finally:
+        if decoder is not None:
+            decoder.close()
+        session.slot.close()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    
+    subprotocol = negotiate_frame_format(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    if readiness['state'] != 'ready':
+        # Models are still warming up; 1013 asks the client to try again later.
+        # Closing before accept() would only reach the client as an HTTP 403.
+        await websocket.close(code=1013, reason='Detectors are still loading')
+        return
+
+    session = DetectionSession(FRAME_SUBPROTOCOLS.get(subprotocol, 'dataurl'),
+                               websocket.query_params.get('client_id'))
+    if INTENT_GATE_ENABLED:
+        session.intent_gate = IntentGate(INTENT_THROTTLED, INTENT_KEEPALIVE_FPS)
+        prune_client_intents()
+        intent_type, _ = client_intents.get(session.client_id, (None, None))
+        session.intent_gate.set_intent(intent_type)
+    event_types = websocket.query_params.get('events', '').split(',')
+    if FLOW_CONTROL_ENABLED and 'flow' in event_types:
+        # Opt-in: clients that don't ask for it can't handle flow messages
+        session.flow = FlowController(FLOW_MAX_FPS, FLOW_MIN_FPS, FLOW_MAX_QUALITY, FLOW_MIN_QUALITY)
+    if HAZARD_EVENTS or 'hazards' in event_types:
+        session.hazards = HazardMonitor(
+            class_table, HAZARD_LABELS, HAZARD_BANDS, HAZARD_HYSTERESIS,
+            HAZARD_CONFIRM_FRAMES, HAZARD_LEAVE_SECONDS
+        )
+    if TRACKING_ENABLED:
+        session.tracker = ObjectTracker(
+            class_table, TRACKING_DETECT_INTERVAL, TRACKING_MAX_INTERVAL,
+            max_age=TRACKING_MAX_AGE
+        )
+    if MOTION_GATE_ENABLED:
+        session.motion_gate = MotionGate(
+            MOTION_GATE_THRESHOLD, MOTION_GATE_HIST_THRESHOLD, MOTION_GATE_MAX_STALENESS_MS
+        )
+    try:
+        latency_budget_ms = float(websocket.query_params.get('latency_budget_ms', LATENCY_BUDGET_MS))
+        if not math.isfinite(latency_budget_ms):
+            raise ValueError
+    except ValueError:
+        await websocket.close(code=1008, reason='latency_budget_ms must be a number of milliseconds')
+        return
+    if latency_budget_ms > 0:
+        session.resolution = ResolutionController(latency_budget_ms, RESOLUTION_LADDER)
+    cadence = ModelCadence(MODEL_CADENCE, CADENCE_MOTION_SCORE, CADENCE_VIDEO_MOTION)
+    if cadence.enabled:
+        session.cadence = cadence
     try:
+        session.encoder = ResultEncoder(class_table, websocket.query_params.get('results', RESULT_FORMAT))
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    sessions[session.id] = session
+    receiver = asyncio.create_task(receive_frames(websocket, session))
+    close_code, close_reason = 1000, ''
+
+    try:
+        if session.encoder.binary:
+            # Binary results carry label ids; the labels themselves are sent once
+            await websocket.send_text(label_table_message(class_table))
+        # Only ever infer on the newest frame; older ones are counted as skipped
         while True:
-            frame_data = await websocket.receive_text()
-            detections = detector.process_frame(frame_data)
-            await websocket.send_json(detections)
+            frame_data = await session.slot.get()
+            if frame_data is None:
+                decoder = session.video_decoder
+                if decoder is not None and decoder.error is not None:
+                    close_code, close_reason = 1003, 'Could not decode the video stream'
+                break
+            if session.intent_gate is not None and not session.intent_gate.should_detect():
+                intent_skips.inc()
+                continue
+            start = time.perf_counter()
+            detections = await detect_for_session(session, frame_data)
+            if detections is None:
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            session.frame_processed(elapsed_ms)
+            frame_ms.observe(elapsed_ms)
+
+            start = time.perf_counter()
+            payload = session.encoder.encode(detections)
+            stage_ms['encode'].observe((time.perf_counter() - start) * 1000)
+            if payload is not None:
+                start = time.perf_counter()
+                if session.encoder.binary:
+                    await websocket.send_bytes(payload)
+                else:
+                    await websocket.send_text(payload)
+                stage_ms['send'].observe((time.perf_counter() - start) * 1000)
+                result_bytes.inc(len(payload))
+
+            if session.hazards is not None:
+                # Only state changes go out, not the hazards seen on every frame
+                events = session.hazards.update(detections)
+                if events:
+                    message = json.dumps({'type': 'hazards', 'events': events})
+                    await websocket.send_text(message)
+                    result_bytes.inc(len(message))
+                    for event in events:
+                        hazard_events[event['event']].inc()
+
+            if session.flow is not None:
+                fps_cap = None
+                if session.intent_gate is not None and not session.intent_gate.full_rate:
+                    # Twice the keep-alive rate so the gate always has a recent frame
+                    fps_cap = 2 * INTENT_KEEPALIVE_FPS
+                flow = session.flow.update(elapsed_ms, inference_queue_depth(),
+                                           inference_workers(), fps_cap)
+                if flow is not None:
+                    await websocket.send_text(flow)
+                    flow_messages.inc()
     except Exception as e:
         print(f"Error: {e}")
+        # 1011 tells the client detection broke, rather than that nothing was seen
+        close_code, close_reason = 1011, 'Detection failed'
+    finally:
+        receiver.cancel()
+        sessions.pop(session.id, None)
+        try:
+            await websocket.close(code=close_code, reason=close_reason)
+        except Exception:
+            pass  # client already disconnected
+
+bulk_images = REGISTRY.counter(
+    'mantra_bulk_images_total', 'Images processed through POST /detect/batch')
+
+def read_bulk_batch(images, size, imgsz):
+    """Next `size` (name, decoded or None) pairs of an image iterator (blocking)"""
+    batch = []
+    for name, data in itertools.islice(images, size):
+        decoded = decode_frame_for_size(data, imgsz)
+        batch.append((name, decoded if decoded[0] is not None else None))
+    return batch
+
+async def detect_ring_bulk(decoded, imgsz):
+    """One bulk image through the frame ring, leaving the other slots to websockets"""
+    if bulk_slots is None:
+        return await ring_client.detect(decoded, imgsz)
+    async with bulk_slots:
+        return await ring_client.detect(decoded, imgsz)
+
+async def get_bulk_pool():
+    """Replicas for bulk requests, loaded the first time one arrives (not warmed up)"""
+    global bulk_pool
+    if BULK_POOL_SIZE <= 0:
+        return detector_pool
+    async with bulk_pool_lock:
+        if bulk_pool is None:
+            bulk_pool = await asyncio.get_running_loop().run_in_executor(
+                None, DetectorPool, ObjectDetector, BULK_POOL_SIZE, DETECTOR_TORCH_THREADS)
+    return bulk_pool
+
+async def detect_bulk(decoded, imgsz=None):
+    """Detect a whole batch of decoded frames at once, bypassing the micro-batcher"""
+    if ring_client is not None:
+        return await asyncio.gather(*(detect_ring_bulk(d, imgsz) for d in decoded))
+    pool = await get_bulk_pool()
+    return await pool.run(ObjectDetector.detect_decoded, decoded, imgsz)
+
+async def stream_bulk_results(images, imgsz, close):
+    """NDJSON lines of detections per image, decoding the next batch while this one is inferred"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    index = failed = 0
+    pending = None
+
+    def read_next():
+        return loop.run_in_executor(None, read_bulk_batch, images, BULK_BATCH_SIZE,
+                                    imgsz or INFERENCE_IMGSZ)
+
+    try:
+        pending = read_next()
+        while True:
+            try:
+                batch = await pending
+            except Exception as e:
+                yield json.dumps({'error': f'Could not read images: {e}'}) + '\n'
+                break
+            if not batch:
+                break
+            pending = read_next()
+
+            decoded = [item for item in batch if item[1] is not None]
+            error = None
+            try:
+                results = iter(await detect_bulk([d for _, d in decoded], imgsz) if decoded else ())
+            except Exception as e:
+                print(f"Bulk detection error: {e}")
+                error = f'Detection failed: {e}'
+            lines = []
+            for name, frame in batch:
+                if frame is None or error is not None:
+                    failed += 1
+                    lines.append({'index': index, 'name': name,
+                                  'error': error or 'Could not decode image'})
+                else:
+                    lines.append({'index': index, 'name': name,
+                                  'detections': next(results).to_records(class_table)})
+                index += 1
+            bulk_images.inc(len(batch))
+            yield ''.join(json.dumps(line) + '\n' for line in lines)
+
+        yield json.dumps({'done': True, 'images': index, 'failed': failed,
+                          'seconds': round(time.perf_counter() - start, 3)}) + '\n'
     finally:
-        await websocket.close()
+        # The client may go away while the next batch is still being read
+        if pending is not None and not pending.done():
+            pending.add_done_callback(lambda _: close())
+        else:
+            close()
+
+@app.post("/detect/batch")
+async def detect_images(request: Request, imgsz: int = None):
+    """Offline detection over many images, streamed back as NDJSON (one line per image).
+
+    Accepts multipart/form-data with any number of image files, or a zip or
+    (compressed) tar archive as the request body, up to BULK_MAX_UPLOAD_MB.
+    Images go through the detector BULK_BATCH_SIZE at a time, at imgsz if
+    given (one of the sizes the detectors were warmed up at).
+    """
+    if readiness['state'] != 'ready':
+        raise HTTPException(status_code=503, detail='Detectors are still loading')
+    if imgsz is not None and imgsz not in warmup_sizes():
+        raise HTTPException(status_code=422,
+                            detail=f'imgsz must be one of {warmup_sizes()}')
+
+    max_bytes = BULK_MAX_UPLOAD_MB * 1024 * 1024
+    too_large = HTTPException(status_code=413,
+                              detail=f'Uploads are limited to {BULK_MAX_UPLOAD_MB} MB')
+    length = request.headers.get('content-length')
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise too_large
+
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type == 'multipart/form-data':
+        if length is None:
+            # Multipart bodies are parsed in one go, so their size must be known upfront
+            raise HTTPException(status_code=411, detail='Content-Length is required')
+        form = await request.form()
+        uploads = [value for _, value in form.multi_items() if isinstance(value, UploadFile)]
+        images, close = iter_uploads(uploads), lambda: asyncio.create_task(form.close())
+    elif content_type in ARCHIVE_TYPES or content_type == 'application/octet-stream':
+        # zip needs random access, so the body is spooled before reading it;
+        # tar is then read front to back ('r|*') straight from the spool
+        spool = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MEMORY_MB * 1024 * 1024)
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                # Chunked bodies have no Content-Length to check upfront
+                spool.close()
+                raise too_large
+            spool.write(chunk)
+        spool.seek(0)
+        images, close = iter_archive(spool, ARCHIVE_TYPES.get(content_type)), spool.close
+    else:
+        raise HTTPException(status_code=415,
+                            detail='Send multipart/form-data images or a zip/tar archive')
+
+    return StreamingResponse(stream_bulk_results(images, imgsz, close),
+                             media_type='application/x-ndjson')
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until every detector replica is loaded and warmed up"""
+    ready = readiness['state'] == 'ready'
+    if ready and ring_client is not None and not ring_client.healthy():
+        return JSONResponse({**readiness, 'state': 'degraded',
+                             'error': 'inference processes stopped responding'}, status_code=503)
+    return JSONResponse(readiness, status_code=200 if ready else 503)
+
+@app.get("/connections")
+async def list_connections():
+    """Per-connection frame counters, including frames skipped for being stale"""
+    return [session.stats() for session in sessions.values()]
+
+@app.post("/intent")
+async def set_intent(body: dict = Body(...)):
+    """Intent hook for speech_server.py: detect at full rate only while the user needs it.
+
+    The body is {"intent": {"type": ...}, "client_id": ...}; without a
+    client_id the intent applies to every connection that didn't send one.
+    """
+    intent = body.get('intent') or {}
+    intent_type = intent.get('type') if isinstance(intent, dict) else intent
+    client_id = body.get('client_id')
+
+    updated = []
+    for session in sessions.values():
+        if session.intent_gate is not None and session.client_id == client_id:
+            session.intent_gate.set_intent(intent_type)
+            updated.append(session.id)
+    # Kept even without a session, for the client's next websocket
+    client_intents[client_id] = (intent_type, time.monotonic())
+    prune_client_intents()
+    return {
+        'intent': intent_type,
+        'full_rate': intent_type not in INTENT_THROTTLED,
+        'sessions': updated,
+    }
+
+@app.post("/sessions/{session_id}/classes")
+async def set_classes(session_id: int, body: dict = Body(...)):
+    """Limit a connection's detections to some labels or speech entities; null/empty resets it"""
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail='Unknown session')
+    try:
+        active = set_session_classes(session, body.get('labels'), body.get('entities'))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        'id': session_id,
+        'labels': [class_table.labels[i] for i in active] if active is not None else None,
+    }
+
+@app.get("/stats")
+async def detection_stats():
+    """Micro-batching histograms and the motion gate hit ratio"""
+    return {
+        'batching': batcher.stats() if batcher is not None else None,
+        'motion_gate': {
+            'checks': gate_checks.value,
+            'hits': gate_hits.value,
+            'hit_ratio': gate_hits.value / gate_checks.value if gate_checks.value else 0.0,
+        },
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of the stage histograms, counters and gauges"""
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
 
 if __name__ == "__main__":
     import uvicorn
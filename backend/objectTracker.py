@@ -0,0 +1,209 @@
+# objectTracker.py
+import numpy as np
+
+from detectionFusion import iou_matrix
+from detectionPostprocess import DetectionArrays
+
+# Constant-velocity model over [cx, cy, w, h, vcx, vcy, vw, vh], one step per frame
+_F = np.eye(8, dtype=np.float64)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8, dtype=np.float64)
+
+# Noise standard deviations relative to box height, as in SORT/ByteTrack
+_STD_POSITION = 1 / 20
+_STD_VELOCITY = 1 / 160
+
+
+def _xyxy_to_cxcywh(boxes):
+    wh = boxes[:, 2:4] - boxes[:, 0:2]
+    return np.concatenate([boxes[:, 0:2] + wh / 2, wh], axis=1)
+
+
+def _diag(std):
+    """(T, k) standard deviations -> (T, k, k) diagonal covariances"""
+    cov = np.zeros(std.shape + (std.shape[1],))
+    idx = np.arange(std.shape[1])
+    cov[:, idx, idx] = std ** 2
+    return cov
+
+
+class ObjectTracker:
+    """SORT-style multi-object tracker with a Kalman filter per track.
+
+    Full detections only need to run every few frames: in between, step()
+    carries the tracked boxes forward with the motion model. Each track keeps
+    a stable id and an exponentially smoothed distance.
+
+    detect_interval fixes how often full detection runs; 0 makes it adaptive,
+    dropping to every frame when objects appear or disappear and backing off
+    up to max_interval while the scene is stable.
+    """
+
+    def __init__(self, class_table, detect_interval=3, max_interval=6,
+                 iou_threshold=0.3, max_age=5, distance_smoothing=0.3):
+        self.class_table = class_table
+        self.adaptive = detect_interval == 0
+        self.interval = 1 if self.adaptive else detect_interval
+        self.max_interval = max_interval
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.alpha = distance_smoothing
+
+        self.frames_since_detection = 0
+        self._next_id = 1
+
+        # Track state, one row per track
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.x = np.zeros((0, 8))
+        self.P = np.zeros((0, 8, 8))
+        self.class_ids = np.zeros(0, dtype=np.int32)
+        self.source = np.zeros(0, dtype=np.uint8)
+        self.confidence = np.zeros(0, dtype=np.float32)
+        self.distance = np.zeros(0, dtype=np.float32)
+        self.misses = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def should_detect(self):
+        """Whether the next frame needs a full detection pass"""
+        return not len(self) or self.frames_since_detection >= self.interval - 1
+
+    def step(self):
+        """Propagate tracks one frame without a detection"""
+        self.frames_since_detection += 1
+        self._predict()
+        self._smooth_distance(self.class_table.distances(self.class_ids, self.boxes()))
+        return self._visible()
+
+    def update(self, detections):
+        """Predict, associate with fresh detections and return the tracked detections"""
+        self.frames_since_detection = 0
+        self._predict()
+
+        matched_tracks, matched_dets = self._associate(detections)
+        self._correct(matched_tracks, detections.select(matched_dets))
+
+        unmatched = np.ones(len(self), dtype=bool)
+        unmatched[matched_tracks] = False
+        self.misses[unmatched] += 1
+        lost = self.misses > self.max_age
+        num_lost = int(lost.sum())
+        self._keep(~lost)
+
+        new = np.ones(len(detections), dtype=bool)
+        new[matched_dets] = False
+        self._add(detections.select(new))
+
+        if self.adaptive:
+            churn = (int(new.sum()) + num_lost) / max(len(detections), 1)
+            self.interval = 1 if churn > 0.25 else min(self.interval + 1, self.max_interval)
+
+        return self._visible()
+
+    def boxes(self):
+        cx, cy = self.x[:, 0], self.x[:, 1]
+        w = np.maximum(self.x[:, 2], 1.0)
+        h = np.maximum(self.x[:, 3], 1.0)
+        return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1).astype(np.float32)
+
+    def _visible(self):
+        """Tracks seen by the most recent detection"""
+        visible = self.misses == 0
+        return DetectionArrays(
+            self.boxes()[visible].clip(min=0), self.confidence[visible],
+            self.class_ids[visible], self.source[visible], self.distance[visible],
+            self.ids[visible],
+        )
+
+    def _predict(self):
+        if not len(self):
+            return
+        h = np.maximum(self.x[:, 3:4], 1.0)
+        std = np.concatenate([np.repeat(_STD_POSITION * h, 4, axis=1),
+                              np.repeat(_STD_VELOCITY * h, 4, axis=1)], axis=1)
+        self.x = self.x @ _F.T
+        self.P = _F @ self.P @ _F.T + _diag(std)
+
+    def _associate(self, detections):
+        """Greedy class-aware IoU matching between predicted tracks and detections"""
+        if not len(self) or not len(detections):
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+        iou = iou_matrix(self.boxes(), detections.boxes)
+        iou[self.class_ids[:, None] != detections.class_ids[None, :]] = 0.0
+
+        tracks, dets = [], []
+        used_tracks, used_dets = set(), set()
+        flat = np.argsort(-iou, axis=None)
+        for t, d in zip(*np.unravel_index(flat, iou.shape)):
+            if iou[t, d] < self.iou_threshold:
+                break
+            if t in used_tracks or d in used_dets:
+                continue
+            used_tracks.add(t)
+            used_dets.add(d)
+            tracks.append(t)
+            dets.append(d)
+        return np.array(tracks, dtype=np.intp), np.array(dets, dtype=np.intp)
+
+    def _correct(self, tracks, detections):
+        if not len(tracks):
+            return
+        z = _xyxy_to_cxcywh(detections.boxes.astype(np.float64))
+        x, P = self.x[tracks], self.P[tracks]
+
+        R = _diag(np.repeat(_STD_POSITION * np.maximum(z[:, 3:4], 1.0), 4, axis=1))
+        S = _H @ P @ _H.T + R
+        K = P @ _H.T @ np.linalg.inv(S)
+        y = z - x @ _H.T
+        self.x[tracks] = x + (K @ y[:, :, None])[:, :, 0]
+        self.P[tracks] = (np.eye(8) - K @ _H) @ P
+
+        self.confidence[tracks] = detections.confidence
+        self.source[tracks] = detections.source
+        self.misses[tracks] = 0
+        distance = np.full(len(self), np.nan, dtype=np.float32)
+        distance[tracks] = detections.distance
+        updated = np.zeros(len(self), dtype=bool)
+        updated[tracks] = True
+        self._smooth_distance(distance, updated)
+
+    def _smooth_distance(self, distance, mask=None):
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        old = self.distance[mask]
+        new = distance[mask]
+        self.distance[mask] = np.where(
+            np.isnan(old), new,
+            np.where(np.isnan(new), old, self.alpha * new + (1 - self.alpha) * old))
+
+    def _add(self, detections):
+        n = len(detections)
+        if not n:
+            return
+        z = _xyxy_to_cxcywh(detections.boxes.astype(np.float64))
+        x = np.concatenate([z, np.zeros((n, 4))], axis=1)
+        h = np.maximum(z[:, 3:4], 1.0)
+        std = np.concatenate([np.repeat(2 * _STD_POSITION * h, 4, axis=1),
+                              np.repeat(10 * _STD_VELOCITY * h, 4, axis=1)], axis=1)
+
+        self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + n)])
+        self._next_id += n
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, _diag(std)])
+        self.class_ids = np.concatenate([self.class_ids, detections.class_ids])
+        self.source = np.concatenate([self.source, detections.source])
+        self.confidence = np.concatenate([self.confidence, detections.confidence])
+        self.distance = np.concatenate([self.distance, detections.distance.astype(np.float32)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int32)])
+
+    def _keep(self, mask):
+        self.ids = self.ids[mask]
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+        self.class_ids = self.class_ids[mask]
+        self.source = self.source[mask]
+        self.confidence = self.confidence[mask]
+        self.distance = self.distance[mask]
+        self.misses = self.misses[mask]
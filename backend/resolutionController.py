@@ -0,0 +1,62 @@
+# resolutionController.py
+
+
+class ResolutionController:
+    """Picks a per-frame inference resolution from a ladder to stay within a latency budget.
+
+    Tracks a smoothed end-to-end latency at the current resolution, scales it
+    by the inference queue depth, and steps down when the budget is at risk.
+    It steps back up once the estimate for the next size up fits comfortably
+    within the budget.
+    """
+
+    def __init__(self, budget_ms=80, ladder=(320, 416, 640), smoothing=0.3,
+                 headroom=0.7, cooldown_frames=5):
+        self.budget_ms = budget_ms
+        self.ladder = tuple(sorted(ladder))
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.cooldown_frames = cooldown_frames
+
+        # Start at full resolution and only degrade under load
+        self.level = len(self.ladder) - 1
+        self.latency_ms = None
+        self._frames_at_level = 0
+
+    @property
+    def imgsz(self):
+        return self.ladder[self.level]
+
+    def _estimate(self, level, queue_depth, workers):
+        # Inference cost grows with the number of input pixels
+        scale = (self.ladder[level] / self.imgsz) ** 2
+        return self.latency_ms * scale * (1 + queue_depth / max(workers, 1))
+
+    def choose(self, queue_depth=0, workers=1):
+        """Resolution for the next frame given the current inference backlog"""
+        if self.latency_ms is None or self._frames_at_level < self.cooldown_frames:
+            return self.imgsz
+
+        if self._estimate(self.level, queue_depth, workers) > self.budget_ms and self.level > 0:
+            self._set_level(self.level - 1)
+        elif (self.level < len(self.ladder) - 1
+              and self._estimate(self.level + 1, queue_depth, workers)
+              < self.budget_ms * self.headroom):
+            self._set_level(self.level + 1)
+        return self.imgsz
+
+    def observe(self, imgsz, latency_ms):
+        """Feed back the measured latency of a frame run at imgsz"""
+        if imgsz != self.imgsz:
+            return
+        self._frames_at_level += 1
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+
+    def _set_level(self, level):
+        # Re-express the smoothed latency at the new resolution
+        self.latency_ms *= (self.ladder[level] / self.imgsz) ** 2
+        self.level = level
+        self._frames_at_level = 0
@@ -19,6 +19,11 @@ from datetime import timedelta
 from asyncio import Lock, sleep
 from hashlib import md5
 import random
+import os
+import requests
+
+# Detection server that throttles inference to the user's current intent
+DETECTION_SERVER_URL = os.environ.get('DETECTION_SERVER_URL', 'http://localhost:8002')
 
 app = FastAPI()
 
@@ -363,12 +368,33 @@ Return structured JSON with entity mentions and their positions in the text."""
                 "agent_response": "I'm having trouble understanding that. Could you please try again?"
             }
 
+def _post_intent(intent, client_id):
+    requests.post(f"{DETECTION_SERVER_URL}/intent",
+                  json={"intent": intent, "client_id": client_id}, timeout=2)
+
+async def notify_detection_server(intent, client_id=None):
+    """Tell the detection server the latest intent so it can slow down outside surroundings mode"""
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _post_intent, intent, client_id)
+    except Exception as e:
+        print(f"Could not send intent to detection server: {e}")
+
+# Intent notifications still in flight; the event loop only keeps weak references to tasks
+intent_tasks = set()
+
+def notify_in_background(intent, client_id=None):
+    """Send the intent without holding up the speech loop if the detection server is slow"""
+    task = asyncio.create_task(notify_detection_server(intent, client_id))
+    intent_tasks.add(task)
+    task.add_done_callback(intent_tasks.discard)
+
 # Initialize speech processor with your model path
 speech_processor = SpeechProcessor(intent_model_path='./models/intent_classifier')
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    client_id = websocket.query_params.get('client_id')
     try:
         print("Client connected to speech recognition")
 
@@ -378,13 +404,13 @@ async def websocket_endpoint(websocket: WebSocket):
 
         with MicrophoneStream(16000, int(16000 / 10)) as stream:
             audio_generator = stream.generator()
-            requests = (
+            audio_requests = (
                 speech.StreamingRecognizeRequest(audio_content=content)
                 for content in audio_generator
             )
 
             responses = speech_processor.client.streaming_recognize(
-                streaming_config, requests
+                streaming_config, audio_requests
             )
 
             for response in responses:
@@ -417,6 +443,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         
                         # Send the response to the client
                         await websocket.send_json(response_data)
+                        notify_in_background(classification["intent"], client_id)
                         
                         # Log the classification and response
                         print("\n=== Speech Processing Results ===")
@@ -1,13 +1,26 @@
 # src/object_detector.py
-from ultralytics import YOLO
 import cv2
 import numpy as np
 from typing import List, Dict, Any
+from detectionConfig import (
+    MODEL_EXECUTION_MODE, STANDARD_MODEL_THREADS, CUSTOM_MODEL_THREADS,
+    STANDARD_MODEL_CPUS, CUSTOM_MODEL_CPUS,
+)
+from modelWorkers import ModelWorker, run_models
+from detectionPostprocess import SOURCES, ClassTable, DetectionArrays, extract_arrays
 
 class ObjectDetector:
     def __init__(self):
-        self.standard_model = YOLO('yolov8n.pt')
-        self.custom_model = YOLO('./models/yolov8-finetuned-bmth.pt')
+        self.standard_model = ModelWorker(
+            'standard', 'yolov8n.pt', MODEL_EXECUTION_MODE,
+            STANDARD_MODEL_THREADS, STANDARD_MODEL_CPUS
+        )
+        self.custom_model = ModelWorker(
+            'custom', './models/yolov8-finetuned-bmth.pt', MODEL_EXECUTION_MODE,
+            CUSTOM_MODEL_THREADS, CUSTOM_MODEL_CPUS
+        )
+        self.models = {'standard': self.standard_model, 'custom': self.custom_model}
+        self.last_timings: Dict[str, float] = {}
         
         self.REFERENCE_SIZES = {
             'person': 1700,
@@ -23,18 +36,37 @@ class ObjectDetector:
             'halte': 15000,
         }
         self.FOCAL_LENGTH = 600
+        self.HEIGHT_REFERENCE_LABELS = ['person', 'bottle', 'cup']
         self.CONF_THRESHOLD = 0.25
 
+        self.class_table = ClassTable(
+            {name: model.names for name, model in self.models.items()},
+            self.REFERENCE_SIZES, self.FOCAL_LENGTH, self.HEIGHT_REFERENCE_LABELS
+        )
+
     def calculate_distance(self, label: str, w: float, h: float) -> float:
         """Calculate approximate distance to object based on its size in pixels."""
         if label.lower() in self.REFERENCE_SIZES:
             ref_size = self.REFERENCE_SIZES[label.lower()]
-            if label.lower() in ['person', 'bottle', 'cup']:
+            if label.lower() in self.HEIGHT_REFERENCE_LABELS:
                 return (ref_size * self.FOCAL_LENGTH) / h / 10
             else:
                 return (ref_size * self.FOCAL_LENGTH) / w / 10
         return 0.0
 
+    def detect(self, frame) -> DetectionArrays:
+        """Run both models and return struct-of-arrays detections with distances."""
+        # Run detection with both models, concurrently unless in sequential mode
+        results, self.last_timings = run_models(self.models, frame)
+
+        detections = DetectionArrays.concatenate([
+            extract_arrays(results[source], SOURCES.index(source),
+                           self.class_table, self.CONF_THRESHOLD)
+            for source in ('standard', 'custom')
+        ])
+        detections.distance = self.class_table.distances(detections.class_ids, detections.boxes)
+        return detections
+
     def process_frame(self, frame) -> List[Dict[str, Any]]:
         if frame is None:
             return []
@@ -45,56 +77,4 @@ class ObjectDetector:
         elif frame.shape[2] == 4:  # RGBA
             frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB)
 
-        # Run detection with both models
-        standard_results = self.standard_model(frame)
-        custom_results = self.custom_model(frame)
-        
-        all_detections = []
-        
-        # Process standard detections
-        for r in standard_results:
-            for box in r.boxes:
-                conf = float(box.conf[0])
-                if conf < self.CONF_THRESHOLD:
-                    continue
-                    
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                w = x2 - x1
-                h = y2 - y1
-                cls = int(box.cls[0])
-                label = r.names[cls]
-                
-                distance = self.calculate_distance(label, w, h)
-                
-                all_detections.append({
-                    'box': [int(x1), int(y1), int(x2), int(y2)],
-                    'label': label,
-                    'confidence': conf,
-                    'distance': distance,
-                    'source': 'standard'
-                })
-                
-        # Process custom detections
-        for r in custom_results:
-            for box in r.boxes:
-                conf = float(box.conf[0])
-                if conf < self.CONF_THRESHOLD:
-                    continue
-                    
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                w = x2 - x1
-                h = y2 - y1
-                cls = int(box.cls[0])
-                label = r.names[cls]
-                
-                distance = self.calculate_distance(label, w, h)
-                
-                all_detections.append({
-                    'box': [int(x1), int(y1), int(x2), int(y2)],
-                    'label': label,
-                    'confidence': conf,
-                    'distance': distance,
-                    'source': 'custom'
-                })
-        
-        return all_detections
\ No newline at end of file
+        return self.detect(frame).to_records(self.class_table, missing_distance=0.0)
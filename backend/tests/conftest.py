@@ -0,0 +1,34 @@
+# tests/conftest.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detectionPostprocess import ClassTable, DetectionArrays  # noqa: E402
+
+
+@pytest.fixture
+def class_table():
+    """Small two-model class table with ObjectDetector's reference sizes and focal length"""
+    return ClassTable(
+        {'standard': {0: 'person', 1: 'car'}, 'custom': {0: 'pothole', 1: 'stairs', 2: 'car'}},
+        {'person': 1700, 'car': 4500, 'pothole': 1000},
+        600, height_labels=('person',),
+    )
+
+
+def make_detections(boxes, class_ids, confidence=None, source=None, distance=None, track_ids=None):
+    """DetectionArrays from plain lists"""
+    n = len(boxes)
+    return DetectionArrays(
+        np.array(boxes, dtype=np.float32).reshape(n, 4),
+        np.array(confidence if confidence is not None else [0.9] * n, dtype=np.float32),
+        np.array(class_ids, dtype=np.int32),
+        np.array(source if source is not None else [0] * n, dtype=np.uint8),
+        np.array(distance, dtype=np.float32) if distance is not None else None,
+        np.array(track_ids, dtype=np.int64) if track_ids is not None else None,
+    )
@@ -0,0 +1,70 @@
+# tests/test_class_filter.py
+import os
+
+import numpy as np
+import pytest
+
+from classFilter import model_classes, resolve_classes, union_classes
+
+
+def test_labels_and_entities_resolve_to_label_ids(class_table):
+    ids = resolve_classes(class_table, labels=['Stairs'], entities=[{'type': 'obstacle', 'value': 'lubang'}])
+    assert [class_table.labels[i] for i in ids] == ['pothole', 'stairs']
+
+
+def test_always_labels_join_an_active_filter(class_table):
+    ids = resolve_classes(class_table, labels=['stairs'], always=('person', 'bicycle'))
+    assert [class_table.labels[i] for i in ids] == ['person', 'stairs']
+
+
+def test_nothing_known_means_everything(class_table):
+    assert resolve_classes(class_table) is None
+    assert resolve_classes(class_table, labels=['zebra'], always=('person',)) is None
+
+
+def test_entities_may_be_bare_values(class_table):
+    ids = resolve_classes(class_table, entities=['pothole'])
+    assert [class_table.labels[i] for i in ids] == ['pothole']
+
+
+@pytest.mark.parametrize('labels, entities', [
+    ('pothole', None),
+    ([1], None),
+    (None, 'pothole'),
+    (None, [['pothole']]),
+    (None, {'value': 'pothole'}),
+])
+def test_malformed_filters_are_rejected(class_table, labels, entities):
+    with pytest.raises(ValueError):
+        resolve_classes(class_table, labels=labels, entities=entities)
+
+
+def test_union_is_everything_if_any_frame_wants_everything():
+    assert union_classes([np.array([1]), None]) is None
+    assert union_classes([np.array([3, 1]), np.array([1, 0])]).tolist() == [0, 1, 3]
+
+
+def test_model_classes_map_back_to_each_models_own_indices(class_table):
+    car = class_table.label_ids['car']
+    assert model_classes(class_table, 0, np.array([car])) == [1]
+    assert model_classes(class_table, 1, np.array([car])) == [2]
+    assert model_classes(class_table, 1, np.array([class_table.label_ids['person']])) == []
+
+
+def test_filter_does_not_stick_to_the_replica():
+    """ultralytics merges predict() arguments into the predictor, so a filter could outlive its batch"""
+    pytest.importorskip('ultralytics')
+    from detectionConfig import STANDARD_MODEL_PATH, CUSTOM_MODEL_PATH
+    if not (os.path.exists(STANDARD_MODEL_PATH) and os.path.exists(CUSTOM_MODEL_PATH)):
+        pytest.skip('detector weights are not available')
+    from objectDetection import ObjectDetector
+
+    detector = ObjectDetector()
+    frame = np.zeros((480, 640, 3), np.uint8)
+    person = np.array([detector.class_table.label_ids['person']], np.int32)
+
+    detector.detect_batch([frame], classes=[person])
+    detector.detect_batch([frame])
+    for worker in detector.models.values():
+        if worker.model is not None:
+            assert worker.model.predictor.args.classes is None
@@ -0,0 +1,62 @@
+# tests/test_detection_batcher.py
+import asyncio
+
+from detectionBatcher import BatchingDispatcher
+
+
+class InlinePool:
+    """DetectorPool stand-in that runs the batch function on the event loop"""
+
+    size = 1
+    queue_depth = 0
+
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, func, *args):
+        self.calls.append(len(args[0]))
+        return func(None, *args)
+
+
+def double_frames(detector, frames, imgsz, models, classes):
+    if any(frame is None for frame in frames):
+        raise ValueError('bad frame')
+    return [frame * 2 for frame in frames]
+
+
+def test_frames_are_batched_and_get_their_own_results():
+    async def run():
+        pool = InlinePool()
+        batcher = BatchingDispatcher(pool, double_frames, window_ms=20, max_batch_size=8)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        await batcher.stop()
+        return pool, results
+
+    pool, results = asyncio.run(run())
+    assert results == [0, 2, 4, 6, 8]
+    assert pool.calls == [5]
+
+
+def test_bad_frame_only_fails_its_own_request():
+    async def run():
+        batcher = BatchingDispatcher(InlinePool(), double_frames, window_ms=20, max_batch_size=8)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(None), batcher.submit(3),
+                                       return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    good, bad, other = asyncio.run(run())
+    assert (good, other) == (2, 6)
+    assert isinstance(bad, ValueError)
+
+
+def test_different_sizes_are_not_batched_together():
+    async def run():
+        pool = InlinePool()
+        batcher = BatchingDispatcher(pool, double_frames, window_ms=20, max_batch_size=8)
+        await asyncio.gather(batcher.submit(1, 320), batcher.submit(2, 640), batcher.submit(3, 320))
+        await batcher.stop()
+        return pool.calls
+
+    assert sorted(asyncio.run(run())) == [1, 2]
+
@@ -0,0 +1,175 @@
+# tests/test_detection_encoding.py
+import base64
+import json
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from conftest import make_detections
+from detectionEncoding import (
+    HEADER, MESSAGE_DELTA, MESSAGE_FULL, RECORD_DTYPE, ResultEncoder, label_table_message,
+)
+
+
+def decode(payload, objects):
+    """Python twin of src/utils/detectionDecoder.js: apply one binary message to the client state"""
+    kind, count, removed, sequence = HEADER.unpack_from(payload)
+    records = np.frombuffer(payload, RECORD_DTYPE, count, HEADER.size)
+    removed_ids = np.frombuffer(payload, '<u4', removed, HEADER.size + count * RECORD_DTYPE.itemsize)
+    assert len(payload) == HEADER.size + count * RECORD_DTYPE.itemsize + removed * 4
+    if kind == MESSAGE_FULL:
+        objects.clear()
+    for i, record in enumerate(records):
+        # Untracked objects (track id 0) are keyed by position, as in the JS decoder
+        objects[int(record['track_id']) or -(i + 1)] = record
+    for track_id in removed_ids:
+        objects.pop(int(track_id))
+    return kind, sequence
+
+
+def tracked(boxes, track_ids, class_ids=None, distance=None):
+    return make_detections(boxes, class_ids or [0] * len(boxes), distance=distance or [5.0] * len(boxes),
+                           track_ids=track_ids)
+
+
+def test_label_table_describes_the_records(class_table):
+    message = json.loads(label_table_message(class_table))
+    assert message['type'] == 'labels'
+    assert message['labels'] == class_table.labels
+    assert message['record_size'] == RECORD_DTYPE.itemsize == 20
+
+
+def test_json_format_matches_the_records(class_table):
+    encoder = ResultEncoder(class_table, 'json')
+    detections = make_detections([[10, 20, 30, 60]], [0], distance=[3.5])
+    assert not encoder.binary
+    assert json.loads(encoder.encode(detections)) == [
+        {'box': [10, 20, 30, 60], 'label': 'person', 'confidence': pytest.approx(0.9),
+         'distance': 3.5, 'source': 'standard'},
+    ]
+
+
+def test_compact_round_trip(class_table):
+    encoder = ResultEncoder(class_table, 'compact')
+    detections = make_detections([[10.4, 20, 30, 60], [-5, 0, 50000, 10]], [0, 3],
+                                 confidence=[0.5, 1.0], source=[0, 1], distance=[2.5, np.inf])
+    objects = {}
+    kind, sequence = decode(encoder.encode(detections), objects)
+    assert (kind, sequence) == (MESSAGE_FULL, 1)
+
+    records = sorted(objects.values(), key=lambda r: r['label_id'])
+    assert records[0]['box'].tolist() == [10, 20, 30, 60]
+    assert records[1]['box'].tolist() == [-5, 0, 32767, 10]  # clipped to int16
+    assert [r['label_id'] for r in records] == [0, 3]
+    assert [r['source'] for r in records] == [0, 1]
+    assert [r['confidence'] for r in records] == [128, 255]
+    assert records[0]['distance'] == pytest.approx(2.5)
+    assert np.isnan(records[1]['distance'])  # unknown distances are NaN
+
+
+def test_delta_only_sends_changes(class_table):
+    encoder = ResultEncoder(class_table, 'delta')
+    objects = {}
+
+    # First frame: every object is new
+    kind, _ = decode(encoder.encode(tracked([[0, 0, 10, 10], [50, 50, 80, 90]], [1, 2])), objects)
+    assert kind == MESSAGE_DELTA and sorted(objects) == [1, 2]
+
+    # Jitter below move_threshold and small distance changes aren't sent
+    payload = encoder.encode(tracked([[1, 1, 11, 10], [50, 50, 80, 90]], [1, 2], distance=[5.1, 5.0]))
+    assert HEADER.unpack_from(payload)[1:3] == (0, 0)
+
+    # One object moves, one leaves, one appears
+    payload = encoder.encode(tracked([[20, 0, 30, 10], [100, 100, 120, 120]], [1, 3]))
+    _, count, removed, _ = HEADER.unpack_from(payload)
+    assert (count, removed) == (2, 1)
+    decode(payload, objects)
+    assert sorted(objects) == [1, 3]
+    assert objects[1]['box'].tolist() == [20, 0, 30, 10]
+
+
+def test_delta_state_keeps_what_the_client_has(class_table):
+    """Sub-threshold drift accumulates against the last sent box, not the last frame"""
+    encoder = ResultEncoder(class_table, 'delta', move_threshold=2.0)
+    objects = {}
+    for x in (0, 1, 2, 3):
+        decode(encoder.encode(tracked([[x, 0, x + 10, 10]], [7])), objects)
+    assert objects[7]['box'].tolist() == [3, 0, 13, 10]
+
+
+def test_distance_changes_are_relative(class_table):
+    encoder = ResultEncoder(class_table, 'delta', distance_tolerance=0.05)
+    encoder.encode(tracked([[0, 0, 10, 10]], [1], distance=[100.0]))
+    assert HEADER.unpack_from(encoder.encode(tracked([[0, 0, 10, 10]], [1], distance=[104.0])))[1] == 0
+    assert HEADER.unpack_from(encoder.encode(tracked([[0, 0, 10, 10]], [1], distance=[110.0])))[1] == 1
+
+
+def test_reused_detections_send_an_empty_delta(class_table):
+    encoder = ResultEncoder(class_table, 'delta')
+    detections = tracked([[0, 0, 10, 10]], [1])
+    encoder.encode(detections)
+    kind, count, removed, sequence = HEADER.unpack_from(encoder.encode(detections))
+    assert (kind, count, removed, sequence) == (MESSAGE_DELTA, 0, 0, 2)
+
+
+def test_untracked_detections_fall_back_to_full_messages(class_table):
+    encoder = ResultEncoder(class_table, 'delta')
+    objects = {}
+    kind, _ = decode(encoder.encode(make_detections([[0, 0, 10, 10]], [0])), objects)
+    assert kind == MESSAGE_FULL and len(objects) == 1
+
+
+def test_none_format_sends_nothing(class_table):
+    encoder = ResultEncoder(class_table, 'none')
+    assert not encoder.binary
+    assert encoder.encode(make_detections([[0, 0, 10, 10]], [0])) is None
+
+
+def test_unknown_format_is_rejected(class_table):
+    with pytest.raises(ValueError):
+        ResultEncoder(class_table, 'xml')
+
+
+# Feeds base64 messages through src/utils/detectionDecoder.js and prints what the client ends up with
+NODE_DECODER = """
+import { readFileSync } from 'node:fs';
+import { pathToFileURL } from 'node:url';
+const { createDetectionDecoder } = await import(pathToFileURL(process.argv[1]).href);
+const decode = createDetectionDecoder();
+const outputs = JSON.parse(readFileSync(0, 'utf8')).map(([text, data]) => {
+  if (text) return decode(data);
+  const bytes = Buffer.from(data, 'base64');
+  return decode(bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.length));
+});
+console.log(JSON.stringify(outputs));
+"""
+
+
+def test_javascript_decoder_follows_the_delta_stream(class_table):
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip('node is not installed')
+    decoder = os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'utils', 'detectionDecoder.js')
+
+    encoder = ResultEncoder(class_table, 'delta')
+    frames = [
+        tracked([[0, 0, 10, 10], [50, 50, 80, 90]], [1, 2], class_ids=[0, 2]),
+        tracked([[20, 0, 30, 10], [100, 100, 120, 120]], [1, 3], class_ids=[0, 3]),
+        make_detections([[5, 5, 15, 15]], [1], distance=[np.nan]),
+    ]
+    messages = [[True, label_table_message(class_table)]] + [
+        [False, base64.b64encode(encoder.encode(frame)).decode()] for frame in frames
+    ]
+    output = subprocess.run([node, '--input-type=module', '-e', NODE_DECODER, os.path.abspath(decoder)],
+                            input=json.dumps(messages), capture_output=True, text=True, check=True)
+    label_table, first, second, third = json.loads(output.stdout)
+
+    assert label_table is None
+    assert [(o['track_id'], o['label']) for o in first] == [(1, 'person'), (2, 'pothole')]
+    assert sorted((o['track_id'], o['label'], o['box']) for o in second) == [
+        (1, 'person', [20, 0, 30, 10]), (3, 'stairs', [100, 100, 120, 120])]
+    assert third == [{'track_id': 0, 'box': [5, 5, 15, 15], 'label': 'car', 'source': 'standard',
+                      'confidence': pytest.approx(0.9, abs=0.01), 'distance': None}]
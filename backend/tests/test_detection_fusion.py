@@ -0,0 +1,45 @@
+# tests/test_detection_fusion.py
+import pytest
+
+from conftest import make_detections
+from detectionFusion import fuse_detections
+
+
+def wbf(detections, class_table):
+    return fuse_detections(detections, 'wbf', num_models=class_table.model_counts())
+
+
+def test_model_counts_per_label(class_table):
+    counts = dict(zip(class_table.labels, class_table.model_counts().tolist()))
+    assert counts == {'person': 1, 'car': 2, 'pothole': 1, 'stairs': 1}
+    only_custom = dict(zip(class_table.labels, class_table.model_counts(['custom']).tolist()))
+    assert only_custom['person'] == 0 and only_custom['car'] == 1
+
+
+def test_wbf_scores_the_same_with_or_without_duplicate_labels(class_table):
+    person, car = class_table.label_ids['person'], class_table.label_ids['car']
+    unique = wbf(make_detections([[0, 0, 50, 100], [200, 0, 300, 80]], [person, car],
+                                 confidence=[0.8, 0.8]), class_table)
+    with_duplicate = wbf(make_detections(
+        [[0, 0, 50, 100], [200, 0, 300, 80], [400, 0, 450, 100]], [person, car, person],
+        confidence=[0.8, 0.8, 0.8]), class_table)
+
+    # person only comes from one model, so a lone person box keeps its score;
+    # a car seen by just one of the two models that can detect cars is halved
+    assert unique.confidence.tolist() == pytest.approx([0.8, 0.4])
+    assert sorted(with_duplicate.confidence.tolist()) == pytest.approx([0.4, 0.8, 0.8])
+
+
+def test_wbf_merges_agreeing_models_and_drops_weak_boxes(class_table):
+    car, pothole = class_table.label_ids['car'], class_table.label_ids['pothole']
+    detections = make_detections(
+        [[100, 100, 200, 200], [104, 100, 204, 200], [400, 400, 440, 420]],
+        [car, car, car], confidence=[0.8, 0.6, 0.4], source=[0, 1, 1])
+    fused = fuse_detections(detections, 'wbf', num_models=class_table.model_counts(),
+                            score_threshold=0.25)
+    # The lone 0.4 car halves to 0.2 and falls below the threshold
+    assert len(fused) == 1
+    assert fused.confidence[0] == pytest.approx(0.7)
+
+    lone_pothole = make_detections([[0, 0, 40, 20]], [pothole], confidence=[0.5], source=[1])
+    assert wbf(lone_pothole, class_table).confidence.tolist() == pytest.approx([0.5])
@@ -0,0 +1,24 @@
+# tests/test_flow_control.py
+import json
+
+from flowControl import FlowController
+
+
+def test_fps_follows_the_session_latency():
+    flow = FlowController(max_fps=10.0, min_fps=1.0, min_interval_s=0.0)
+    message = json.loads(flow.update(250.0))
+    assert message == {'type': 'flow', 'fps': 4.0, 'quality': 0.6}
+    # Nothing new to say while the recommendation holds
+    assert flow.update(250.0) is None
+
+
+def test_quality_drops_as_the_queue_grows():
+    flow = FlowController(max_quality=0.6, min_quality=0.3)
+    assert flow.target(queue_depth=0, workers=2)[1] == 0.6
+    assert flow.target(queue_depth=2, workers=2)[1] == 0.5
+    assert flow.target(queue_depth=4, workers=2)[1] == 0.3
+
+
+def test_fps_cap_limits_the_target():
+    flow = FlowController(max_fps=10.0)
+    assert flow.target(fps_cap=2.0)[0] == 2.0
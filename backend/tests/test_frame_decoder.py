@@ -0,0 +1,55 @@
+# tests/test_frame_decoder.py
+import struct
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from frameDecoder import decode_frame_for_size, frame_bytes, jpeg_size  # noqa: E402
+
+
+def segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def sof(marker, height, width):
+    return segment(marker, bytes([8]) + struct.pack('>HH', height, width) + bytes([3]) + bytes(9))
+
+
+def test_jpeg_size_reads_the_start_of_frame():
+    data = b'\xff\xd8' + segment(0xE0, b'JFIF\x00' + bytes(9)) + sof(0xC0, 480, 640) + b'\xff\xd9'
+    assert jpeg_size(data) == (480, 640)
+
+
+def test_jpeg_size_skips_tables_and_fill_bytes():
+    # DHT (0xC4) is in the SOF range but isn't a frame header
+    data = (b'\xff\xd8' + segment(0xC4, bytes(20)) + b'\xff\xff' + segment(0xDB, bytes(65))
+            + sof(0xC2, 1080, 1920))
+    assert jpeg_size(data) == (1080, 1920)
+
+
+@pytest.mark.parametrize('data', [b'', b'\x89PNG\r\n\x1a\n' + bytes(20), b'\xff\xd8\xff\xe0\x00'])
+def test_jpeg_size_is_none_for_other_data(data):
+    assert jpeg_size(data) is None
+
+
+def test_jpeg_size_matches_a_real_encoding():
+    ok, encoded = cv2.imencode('.jpg', np.zeros((360, 500, 3), np.uint8))
+    assert ok and jpeg_size(encoded.tobytes()) == (360, 500)
+
+
+def test_large_jpegs_decode_reduced_with_the_original_size():
+    ok, encoded = cv2.imencode('.jpg', np.zeros((1440, 2560, 3), np.uint8))
+    frame, size = decode_frame_for_size(encoded.tobytes(), 640)
+    assert size == (1440, 2560)
+    assert frame.shape[:2] == (360, 640)  # decoded at 1/4 scale
+
+
+def test_undecodable_payloads_give_no_frame():
+    assert decode_frame_for_size(b'not an image', 640) == (None, None)
+
+
+def test_frame_bytes_accepts_data_urls():
+    assert frame_bytes('data:image/jpeg;base64,aGVsbG8=') == b'hello'
+    assert frame_bytes(b'raw') == b'raw'
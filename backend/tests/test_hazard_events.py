@@ -0,0 +1,48 @@
+# tests/test_hazard_events.py
+import pytest
+
+from conftest import make_detections
+from hazardEvents import HazardMonitor
+
+
+def hazards(class_table, boxes, class_ids, track_ids=None):
+    """Detections with distances computed like ObjectDetector does"""
+    detections = make_detections(boxes, class_ids, track_ids=track_ids)
+    detections.distance = class_table.distances(detections.class_ids, detections.boxes)
+    return detections
+
+
+def pothole(class_table, width):
+    label_id = class_table.label_ids['pothole']
+    return hazards(class_table, [[300, 400, 300 + width, 440]], [label_id])
+
+
+def test_detector_distances_are_centimetres(class_table):
+    person = class_table.label_ids['person']
+    # A 1.7 m person 200 px tall at focal length 600 is about 5 m away
+    detections = hazards(class_table, [[100, 100, 160, 300]], [person])
+    assert detections.distance[0] == pytest.approx(510, rel=0.01)
+
+
+def test_bands_are_compared_in_meters(class_table):
+    monitor = HazardMonitor(class_table, ['pothole'], bands=(2.0, 5.0), confirm_frames=1)
+    # 1000 mm wide at focal length 600: 200 px is 3 m away
+    [event] = monitor.update(pothole(class_table, 200), now=0.0)
+    assert event['event'] == 'enter'
+    assert event['distance'] == pytest.approx(3.0)
+    assert event['band'] == 5.0
+
+    # 400 px is 1.5 m, past the 2 m edge with hysteresis
+    [event] = monitor.update(pothole(class_table, 400), now=0.1)
+    assert event['event'] == 'approaching'
+    assert event['band'] == 2.0
+
+
+def test_far_hazards_are_in_no_band(class_table):
+    monitor = HazardMonitor(class_table, ['pothole'], bands=(2.0, 5.0), confirm_frames=1)
+    # 60 px is 10 m away
+    [event] = monitor.update(pothole(class_table, 60), now=0.0)
+    assert event['band'] is None
+    assert event['distance'] == pytest.approx(10.0)
+
+    assert monitor.update(make_detections([], []), now=3.0)[0]['event'] == 'leave'
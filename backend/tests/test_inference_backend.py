@@ -0,0 +1,17 @@
+# tests/test_inference_backend.py
+import pytest
+
+pytest.importorskip('cv2')
+pytest.importorskip('torch')
+
+from inferenceBackend import format_report  # noqa: E402
+
+
+def test_report_table_rows_have_matching_cells():
+    row = {'p50_ms': 10.0, 'p95_ms': 12.0, 'speedup_vs_pytorch': 1.5, 'recall_vs_pytorch': 0.98,
+           'precision_vs_pytorch': 0.97, 'mean_abs_confidence_diff': 0.01}
+    report = {'frames': 10, 'imgsz': 640, 'models': {'standard': {'onnx': row}}}
+    table = [line for line in format_report(report).splitlines() if line.startswith('|')]
+    assert len(table) == 3
+    # Cells are separated by unescaped pipes only
+    assert len({line.count('|') for line in table}) == 1
@@ -0,0 +1,18 @@
+# tests/test_intent_gate.py
+from intentGate import IntentGate
+
+
+def test_only_throttled_intents_leave_full_rate():
+    gate = IntentGate(('asking_for_direction', 'service_recommendation'), keepalive_fps=1.0)
+    assert gate.full_rate
+
+    for intent in ('analyzing_surroundings', 'unknown', None):
+        gate.set_intent(intent)
+        assert gate.full_rate, intent
+        assert gate.should_detect() and gate.should_detect()
+
+    gate.set_intent('asking_for_direction')
+    assert not gate.full_rate
+    # Frames within a keep-alive interval of the last detection are skipped
+    assert not gate.should_detect() and not gate.should_detect()
+    assert gate.skipped == 2
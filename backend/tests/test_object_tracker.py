@@ -0,0 +1,70 @@
+# tests/test_object_tracker.py
+import numpy as np
+
+from conftest import make_detections
+from objectTracker import ObjectTracker
+
+
+def person(x, distance=5.0):
+    return make_detections([[x, 100, x + 40, 200]], [0], distance=[distance])
+
+
+def test_track_ids_are_stable_while_an_object_moves(class_table):
+    tracker = ObjectTracker(class_table, detect_interval=1)
+    ids = [tracker.update(person(100 + 5 * i)).track_ids.tolist() for i in range(6)]
+    assert ids == [[1]] * 6
+
+
+def test_new_objects_get_new_ids(class_table):
+    tracker = ObjectTracker(class_table, detect_interval=1)
+    tracker.update(person(100))
+    both = make_detections([[105, 100, 145, 200], [400, 50, 500, 150]], [0, 1], distance=[5.0, 9.0])
+    result = tracker.update(both)
+    assert dict(zip(result.class_ids.tolist(), result.track_ids.tolist())) == {0: 1, 1: 2}
+
+
+def test_association_is_class_aware(class_table):
+    tracker = ObjectTracker(class_table, detect_interval=1)
+    tracker.update(person(100))
+    same_box_other_label = make_detections([[100, 100, 140, 200]], [1], distance=[5.0])
+    assert tracker.update(same_box_other_label).track_ids.tolist() == [2]
+
+
+def test_lost_tracks_are_dropped_after_max_age(class_table):
+    tracker = ObjectTracker(class_table, detect_interval=1, max_age=2)
+    tracker.update(person(100))
+    empty = make_detections([], [], distance=[])
+    for _ in range(2):
+        assert len(tracker.update(empty)) == 0  # hidden, but still tracked
+        assert len(tracker) == 1
+    tracker.update(empty)
+    assert len(tracker) == 0
+    # A reappearing object starts a new track
+    assert tracker.update(person(100)).track_ids.tolist() == [2]
+
+
+def test_step_extrapolates_between_detections(class_table):
+    tracker = ObjectTracker(class_table, detect_interval=3)
+    for i in range(5):
+        tracker.update(person(100 + 10 * i))
+    assert not tracker.should_detect()
+    before = tracker.boxes()[0, 0]
+    stepped = tracker.step()
+    assert stepped.track_ids.tolist() == [1]
+    assert stepped.boxes[0, 0] > before  # keeps moving right
+
+
+def test_distances_are_smoothed(class_table):
+    tracker = ObjectTracker(class_table, detect_interval=1, distance_smoothing=0.5)
+    tracker.update(person(100, distance=10.0))
+    result = tracker.update(person(100, distance=6.0))
+    assert np.isclose(result.distance[0], 8.0)
+
+
+def test_adaptive_interval_backs_off_in_stable_scenes(class_table):
+    tracker = ObjectTracker(class_table, detect_interval=0, max_interval=4)
+    tracker.update(person(100))
+    assert tracker.interval == 1  # a new object forces detection every frame
+    for _ in range(5):
+        tracker.update(person(100))
+    assert tracker.interval == 4
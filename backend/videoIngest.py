@@ -0,0 +1,164 @@
+# videoIngest.py
+import collections
+import io
+import threading
+
+import numpy as np
+
+# Websocket stream formats and the demuxer PyAV opens them with
+VIDEO_FORMATS = {
+    'fmp4': 'mp4',   # fragmented MP4 (moov first, then moof/mdat fragments)
+    'webm': 'webm',  # MediaRecorder output
+    'h264': 'h264',  # raw Annex-B elementary stream
+}
+
+
+def video_ingest_available():
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class VideoFrame:
+    """A frame decoded from a video stream, with its encoder motion estimate.
+
+    frame is a decoded av.VideoFrame (or an already converted BGR array);
+    it is only converted to BGR pixels when `image` is first read, so frames
+    replaced in the session slot before inference never pay for it.
+    """
+
+    __slots__ = ('_frame', '_image', 'motion', 'key_frame')
+
+    def __init__(self, frame, motion=None, key_frame=False):
+        self._frame = frame
+        self._image = frame if isinstance(frame, np.ndarray) else None
+        # Mean motion vector length as a fraction of the frame width, None if unknown
+        self.motion = motion
+        self.key_frame = key_frame
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = self._frame.to_ndarray(format='bgr24')
+            self._frame = None
+        return self._image
+
+
+class _ByteStream(io.RawIOBase):
+    """Blocking, non-seekable file object fed with websocket messages"""
+
+    def __init__(self):
+        self._chunks = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.buffered = 0
+
+    def readable(self):
+        return True
+
+    def feed(self, data):
+        with self._cond:
+            self._chunks.append(memoryview(data))
+            self.buffered += len(data)
+            self._cond.notify()
+
+    def finish(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def readinto(self, buffer):
+        with self._cond:
+            while not self._chunks and not self._closed:
+                self._cond.wait()
+            if not self._chunks:
+                return 0  # EOF
+            chunk = self._chunks[0]
+            n = min(len(buffer), len(chunk))
+            buffer[:n] = chunk[:n]
+            if n == len(chunk):
+                self._chunks.popleft()
+            else:
+                self._chunks[0] = chunk[n:]
+            self.buffered -= n
+            return n
+
+
+def _motion_score(frame):
+    side_data = frame.side_data.get('MOTION_VECTORS')
+    if side_data is None:
+        return None
+    vectors = side_data.to_ndarray()
+    if not len(vectors):
+        return 0.0
+    scale = np.maximum(vectors['motion_scale'], 1)
+    length = np.hypot(vectors['motion_x'] / scale, vectors['motion_y'] / scale)
+    return float(length.mean()) / max(frame.width, 1)
+
+
+class VideoStreamDecoder:
+    """Incrementally decodes a continuous video byte stream on a background thread.
+
+    Each decoded frame is handed to on_frame(VideoFrame). When more than
+    max_backlog_bytes of the stream are waiting to be demuxed, packets are
+    dropped up to the next keyframe so the decoder catches up with the live
+    edge instead of decoding stale frames. If the stream can't be decoded,
+    the error is kept in `error` and passed to on_error.
+    """
+
+    def __init__(self, stream_format, on_frame, max_backlog_bytes=512 * 1024, on_error=None):
+        if stream_format not in VIDEO_FORMATS:
+            raise ValueError(f"Unknown video format '{stream_format}', expected one of {tuple(VIDEO_FORMATS)}")
+        self.stream_format = stream_format
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.max_backlog_bytes = max_backlog_bytes
+
+        self.bytes_received = 0
+        self.frames_decoded = 0
+        self.packets_dropped = 0
+        self.error = None
+
+        self._stream = _ByteStream()
+        self._thread = threading.Thread(target=self._decode, name='video-decoder', daemon=True)
+        self._thread.start()
+
+    def feed(self, data):
+        self.bytes_received += len(data)
+        self._stream.feed(data)
+
+    def close(self):
+        self._stream.finish()
+
+    def _decode(self):
+        import av
+
+        try:
+            with av.open(self._stream, mode='r', format=VIDEO_FORMATS[self.stream_format]) as container:
+                stream = container.streams.video[0]
+                # Have the decoder export the encoder's motion vectors
+                stream.codec_context.options = {'flags2': '+export_mvs'}
+                stream.thread_type = 'AUTO'
+
+                skipping = False
+                for packet in container.demux(stream):
+                    if packet.size == 0:
+                        continue
+                    if self._stream.buffered > self.max_backlog_bytes:
+                        skipping = True
+                    if skipping:
+                        if not packet.is_keyframe:
+                            self.packets_dropped += 1
+                            continue
+                        skipping = False
+
+                    for frame in packet.decode():
+                        self.frames_decoded += 1
+                        self.on_frame(VideoFrame(frame, _motion_score(frame), frame.key_frame))
+        except Exception as e:
+            self.error = e
+            print(f"Video decode error: {e}")
+            if self.on_error is not None:
+                self.on_error(e)
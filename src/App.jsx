@@ -46,7 +46,8 @@ const App = () => {
   const detections = useWebSocket(
     videoRef, 
     handleDetections, 
-    activeMode === 'surroundings'
+    activeMode === 'surroundings',
+    entities
   );
 
   const handleVoiceControl = useCallback(() => {
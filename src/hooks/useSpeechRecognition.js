@@ -1,5 +1,6 @@
 // src/hooks/useSpeechRecognition.js
 import { useState, useEffect, useRef } from 'react';
+import { CLIENT_ID } from '../utils/clientId';
 
 export const useSpeechRecognition = () => {
   const [isListening, setIsListening] = useState(false);
@@ -13,7 +14,7 @@ export const useSpeechRecognition = () => {
   useEffect(() => {
     if (isListening && !wsRef.current) {
       try {
-        wsRef.current = new WebSocket('ws://localhost:8000/ws');
+        wsRef.current = new WebSocket(`ws://localhost:8000/ws?client_id=${CLIENT_ID}`);
         
         console.log('Attempting Speech WebSocket connection...');
 
@@ -1,10 +1,34 @@
 // hooks/useWebSocket.js
 import { useEffect, useRef, useState } from 'react';
+import { createDetectionDecoder } from '../utils/detectionDecoder';
+import { CLIENT_ID } from '../utils/clientId';
 
-export const useWebSocket = (videoRef, onDetections, isActive) => {
+// MediaRecorder formats the detection server can decode, most preferred first
+const VIDEO_MIME_TYPES = ['video/webm;codecs=h264', 'video/webm;codecs=vp8'];
+
+// Ask the server to only look for what the user talked about; null entities
+// (or ones it can't map to a label) scan for everything again
+const sendClasses = (ws, entities) => {
+  if (ws?.readyState === WebSocket.OPEN) {
+    ws.send(JSON.stringify({ type: 'classes', entities: entities?.length ? entities : null }));
+  }
+};
+
+export const useWebSocket = (videoRef, onDetections, isActive, entities = null, onHazards = null) => {
   const wsRef = useRef(null);
+  const recorderRef = useRef(null);
+  const entitiesRef = useRef(entities);
+  const onHazardsRef = useRef(onHazards);
+  onHazardsRef.current = onHazards;
+  // Frame rate and JPEG quality, adjusted by the server's flow-control messages
+  const flowRef = useRef({ fps: 10, quality: 0.5 });
   const [detections, setDetections] = useState([]);
 
+  useEffect(() => {
+    entitiesRef.current = entities;
+    sendClasses(wsRef.current, entities);
+  }, [entities]);
+
   useEffect(() => {
     if (!isActive) {
       // Clean up if not active
@@ -17,16 +41,82 @@ export const useWebSocket = (videoRef, onDetections, isActive) => {
 
     console.log('Setting up WebSocket connection...'); // Debug log
     
+    // Stream the camera as WebM when the browser can record it; the server
+    // only accepts this when it has video decoding available
+    const videoMimeType = typeof MediaRecorder !== 'undefined'
+      ? VIDEO_MIME_TYPES.find((type) => MediaRecorder.isTypeSupported(type))
+      : undefined;
+
+    const stopRecorder = () => {
+      if (recorderRef.current && recorderRef.current.state !== 'inactive') {
+        recorderRef.current.stop();
+      }
+      recorderRef.current = null;
+    };
+
+    const startRecorder = (ws) => {
+      const stream = videoRef.current?.srcObject;
+      if (!stream) {
+        return false;
+      }
+      const recorder = new MediaRecorder(stream, {
+        mimeType: videoMimeType,
+        videoBitsPerSecond: 500000,
+      });
+      recorder.ondataavailable = (event) => {
+        if (event.data.size > 0 && ws.readyState === WebSocket.OPEN) {
+          ws.send(event.data);
+        }
+      };
+      recorder.start(100);
+      recorderRef.current = recorder;
+      return true;
+    };
+
+    // Cleared when the server can't decode our video stream, so we reconnect with JPEG frames
+    let useVideo = Boolean(videoMimeType);
+
     const connectWebSocket = () => {
-      wsRef.current = new WebSocket('ws://localhost:8002/ws');
+      // Ask for a WebM video stream or raw JPEG frames in binary messages; the
+      // server falls back to base64 data URLs for clients that offer neither
+      const subprotocols = useVideo ? ['mantra.webm', 'mantra.binary'] : ['mantra.binary'];
+      // Binary results that only carry objects that appeared, moved or left,
+      // plus hazard events and flow-control hints for the frame rate
+      wsRef.current = new WebSocket(
+        `ws://localhost:8002/ws?results=delta&events=hazards,flow&client_id=${CLIENT_ID}`, subprotocols);
+      wsRef.current.binaryType = 'arraybuffer';
+      const decodeDetections = createDetectionDecoder();
       
       wsRef.current.onopen = () => {
         console.log('Object detection WebSocket connected');
+        const ws = wsRef.current;
+        if (entitiesRef.current?.length) {
+          sendClasses(ws, entitiesRef.current);
+        }
+        if (ws.protocol === 'mantra.webm' && !startRecorder(ws)) {
+          console.error('No camera stream to record, closing video WebSocket');
+          ws.close();
+        }
       };
 
       wsRef.current.onmessage = (event) => {
         try {
-          const newDetections = JSON.parse(event.data);
+          if (typeof event.data === 'string' && event.data.startsWith('{"type": "flow"')) {
+            const { fps, quality } = JSON.parse(event.data);
+            flowRef.current = { fps, quality };
+            return;
+          }
+          if (typeof event.data === 'string' && event.data.startsWith('{"type": "hazards"')) {
+            // Hazards that appeared, got closer or left; nothing while they stay put
+            const { events } = JSON.parse(event.data);
+            console.log('Hazard events:', events); // Debug log
+            onHazardsRef.current?.(events);
+            return;
+          }
+          const newDetections = decodeDetections(event.data);
+          if (newDetections === null) {
+            return; // label table
+          }
           console.log('Received detections:', newDetections); // Debug log
           setDetections(newDetections);
           onDetections(newDetections);
@@ -39,7 +129,12 @@ export const useWebSocket = (videoRef, onDetections, isActive) => {
         console.error('WebSocket error:', error);
       };
 
-      wsRef.current.onclose = () => {
+      wsRef.current.onclose = (event) => {
+        stopRecorder();
+        if (event.code === 1003) {
+          console.error('Server could not decode the video stream, switching to JPEG frames');
+          useVideo = false;
+        }
         console.log('WebSocket closed, attempting to reconnect...');
         if (isActive) {
           setTimeout(connectWebSocket, 1000);
@@ -49,26 +144,43 @@ export const useWebSocket = (videoRef, onDetections, isActive) => {
 
     connectWebSocket();
 
-    const sendFramesInterval = setInterval(() => {
-      if (wsRef.current?.readyState === WebSocket.OPEN && videoRef.current) {
+    let sendFramesTimeout = null;
+    const sendFrame = () => {
+      // Video streams are sent by the MediaRecorder instead
+      if (wsRef.current?.readyState === WebSocket.OPEN && videoRef.current
+          && wsRef.current.protocol !== 'mantra.webm') {
         try {
           const canvas = document.createElement('canvas');
           canvas.width = videoRef.current.videoWidth;
           canvas.height = videoRef.current.videoHeight;
           const ctx = canvas.getContext('2d');
           ctx.drawImage(videoRef.current, 0, 0);
-          const frameData = canvas.toDataURL('image/jpeg', 0.5);
-          console.log('Sending frame to object detection server...'); // Debug log
-          wsRef.current.send(frameData);
+          const ws = wsRef.current;
+          if (ws.protocol === 'mantra.binary') {
+            canvas.toBlob((blob) => {
+              if (blob && ws.readyState === WebSocket.OPEN) {
+                console.log('Sending frame to object detection server...'); // Debug log
+                ws.send(blob);
+              }
+            }, 'image/jpeg', flowRef.current.quality);
+          } else {
+            const frameData = canvas.toDataURL('image/jpeg', flowRef.current.quality);
+            console.log('Sending frame to object detection server...'); // Debug log
+            ws.send(frameData);
+          }
         } catch (error) {
           console.error('Error sending frame:', error);
         }
       }
-    }, 100);
+      // Send at the rate the server says it can keep up with
+      sendFramesTimeout = setTimeout(sendFrame, 1000 / flowRef.current.fps);
+    };
+    sendFrame();
 
     return () => {
       console.log('Cleaning up WebSocket connection...'); // Debug log
-      clearInterval(sendFramesInterval);
+      clearTimeout(sendFramesTimeout);
+      stopRecorder();
       if (wsRef.current) {
         wsRef.current.close();
         wsRef.current = null;
@@ -0,0 +1,6 @@
+// src/utils/clientId.js
+// Identifies this browser tab to both backends, so the intents the speech
+// server classifies reach this tab's detection websocket.
+export const CLIENT_ID = typeof crypto !== 'undefined' && crypto.randomUUID
+  ? crypto.randomUUID()
+  : Math.random().toString(36).slice(2);
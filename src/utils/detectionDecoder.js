@@ -0,0 +1,66 @@
+// src/utils/detectionDecoder.js
+// Decodes the compact/delta binary results of the detection websocket
+// (backend/detectionEncoding.py) back into the JSON detection objects.
+
+const MESSAGE_FULL = 1;
+const HEADER_SIZE = 12;
+
+export const createDetectionDecoder = () => {
+  let labels = [];
+  let sources = [];
+  let recordSize = 20;
+  // Objects the client currently knows about, by track id
+  let objects = new Map();
+
+  const readRecord = (view, offset) => {
+    const distance = view.getFloat32(offset + 16, true);
+    return {
+      track_id: view.getUint32(offset, true),
+      box: [
+        view.getInt16(offset + 4, true),
+        view.getInt16(offset + 6, true),
+        view.getInt16(offset + 8, true),
+        view.getInt16(offset + 10, true),
+      ],
+      label: labels[view.getUint16(offset + 12, true)],
+      source: sources[view.getUint8(offset + 14)],
+      confidence: view.getUint8(offset + 15) / 255,
+      distance: Number.isNaN(distance) ? null : distance,
+    };
+  };
+
+  // Returns the detections for a message, or null for the label table
+  return (data) => {
+    if (typeof data === 'string') {
+      const message = JSON.parse(data);
+      if (message.type === 'labels') {
+        labels = message.labels;
+        sources = message.sources;
+        recordSize = message.record_size;
+        objects = new Map();
+        return null;
+      }
+      return message;
+    }
+
+    const view = new DataView(data);
+    const type = view.getUint8(0);
+    const count = view.getUint16(2, true);
+    const removed = view.getUint16(4, true);
+
+    const records = [];
+    for (let i = 0; i < count; i++) {
+      records.push(readRecord(view, HEADER_SIZE + i * recordSize));
+    }
+    if (type === MESSAGE_FULL) {
+      objects = new Map(records.map((record, i) => [record.track_id || -(i + 1), record]));
+    } else {
+      records.forEach((record) => objects.set(record.track_id, record));
+      const removedOffset = HEADER_SIZE + count * recordSize;
+      for (let i = 0; i < removed; i++) {
+        objects.delete(view.getUint32(removedOffset + i * 4, true));
+      }
+    }
+    return Array.from(objects.values());
+  };
+};